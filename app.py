@@ -1,26 +1,51 @@
 # Import custom utilities
 from utils.rss_fetcher import fetch_rss_feed
 from utils.sentiment_analysis import calculate_sentiment
-from utils.categorization import detect_categories, is_breaking_news, generate_article_hash, extract_image_url
-from utils.trending import update_trending_score
+from utils.categorization import detect_categories, is_breaking_news, extract_image_url
+from utils.trending import TrendingRanker, article_timestamp
+from utils.analysis_cache import AnalysisCache, content_fingerprint
+from utils.leader_election import FileLockElection, RedisLockElection, lease_holder_host
+from utils.snapshot import write_snapshot, load_snapshot, LocalSnapshot
+from utils.article_index import ArticleIndex
+from utils.article_store import ArticleStore
+from utils.redis_store import RedisArticleStore, GENERATION
+from utils.event_stream import EventStream, StreamFilter
+from utils.async_fetcher import AsyncFeedFetcher
+from utils.poll_scheduler import PollScheduler
+from utils.stream_parser import parse_feed_entries
+from utils.keyword_matcher import KeywordMatcher, load_keyword_file
+from utils.sentiment_pool import SentimentPool, sentiment_label
+from utils.near_duplicates import NearDuplicateIndex
+from utils.story_clusters import StoryClusterer
+from utils.article import Article, RecordCache, generate_article_hash
+from utils.pipeline_metrics import PipelineMetrics
+from utils.metrics import MetricsRegistry, RequestClock, REQUEST_START
+from utils.feed_registry import Feed, load_feed_registry, shard_of
+from utils.feed_queue import FeedQueue, RedisFeedQueue
 
 import os
 import time
 import re
 import logging
 import threading
+import socket
 import requests
-import feedparser
 import hashlib
+import calendar
 import json
+import tempfile
+import uuid
+import functools
 import nltk
 from nltk.sentiment import SentimentIntensityAnalyzer
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from flask import Flask, jsonify, request, render_template, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Configure logging
 logging.basicConfig(
@@ -30,8 +55,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class ArticleJSONProvider(DefaultJSONProvider):
+    """Serializes Article records like the article dicts they replaced"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, Article):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
 # Initialize Flask app
 app = Flask(__name__, static_folder='static', template_folder='templates')
+app.json = ArticleJSONProvider(app)
+app.wsgi_app = RequestClock(app.wsgi_app)  # Stamps request start times for the request metrics
 CORS(app)  # Enable CORS for all routes
 
 # Download NLTK resources
@@ -45,18 +81,23 @@ redis_client = None
 try:
     redis_url = os.environ.get('REDIS_URL')
     if redis_url:
-        from redis import Redis
-        redis_client = Redis.from_url(redis_url, decode_responses=True)
+        from redis import ConnectionPool, Redis
+        redis_pool = ConnectionPool.from_url(redis_url, decode_responses=True,
+                                             max_connections=int(os.environ.get('REDIS_MAX_CONNECTIONS', 20)))
+        redis_client = Redis(connection_pool=redis_pool)
         logging.info("Redis connection established")
     else:
         logging.info("No Redis URL provided, using in-memory cache")
 except Exception as e:
     logging.warning(f"Could not connect to Redis: {str(e)}")
 
+# Articles stored once in Redis with sorted-set indexes, updated with per-cycle diffs
+redis_article_store = RedisArticleStore(redis_client) if redis_client else None
+
 # Initialize sentiment analyzer
 sia = SentimentIntensityAnalyzer()
 
-# RSS feed sources
+# Built-in RSS feed sources; RSS_FEEDS is rebuilt from the feed registry as the enabled feeds
 RSS_FEEDS = {
     "New York Times Entertainment": "https://rss.nytimes.com/services/xml/rss/nyt/Movies.xml",
     "BBC Entertainment": "http://feeds.bbci.co.uk/news/entertainment_and_arts/rss.xml",
@@ -71,14 +112,166 @@ RSS_FEEDS = {
     "CNET Entertainment": "https://www.cnet.com/rss/news/"
 }
 
-# Cache to store the latest results
-feed_cache = []
-trending_cache = []
+# Every view served by this process, as one immutable LocalSnapshot. Publishing a generation
+# replaces this reference, so request handlers read it without taking cache_lock or copying.
+local_snapshot = None
 source_stats = {}
-category_cache = {}
 health_status = {"last_successful_update": None, "failed_sources": {}}
 duplicate_count = 0
-cache_lock = threading.Lock()
+cache_lock = threading.Lock()  # Guards the fetch state shared between fetch threads
+
+# Concurrent fetch settings
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', 8))
+FETCH_DEADLINE = float(os.environ.get('FETCH_DEADLINE', 20))
+
+# Per-source fetch state shared between cycles
+source_articles = {}  # Last good articles for each source
+source_latency = {}  # Duration in seconds of the last completed fetch for each source
+in_flight_fetches = {}  # Futures of fetches that may outlive a cycle deadline
+feed_validators = {}  # ETag / Last-Modified of the last parsed response for each source
+conditional_get_stats = {'hits': 0, 'misses': 0}  # 304 responses vs full downloads
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='feed-fetch')
+
+# Fetch engine: 'requests' fetches each feed on a pool thread, 'async' on one event loop with
+# a pooled HTTP/2 client (needs httpx[http2]); both keep their connections across cycles
+FETCH_ENGINE = os.environ.get('FETCH_ENGINE', 'requests').lower()
+FETCH_PER_HOST_LIMIT = int(os.environ.get('FETCH_PER_HOST_LIMIT', 2))
+http_session = None
+async_fetcher = None
+
+# Feed parsing: 'stream' reads the body incrementally and stops after FEED_MAX_ENTRIES items,
+# falling back to feedparser for feeds it can't handle; 'feedparser' always parses the whole body
+FEED_PARSER = os.environ.get('FEED_PARSER', 'stream').lower()
+FEED_MAX_ENTRIES = int(os.environ.get('FEED_MAX_ENTRIES', 15))
+FEED_CHUNK_SIZE = 16384
+source_parse_time = {}  # Seconds spent parsing the last full response of each source
+parser_stats = {'stream': 0, 'feedparser': 0}  # Responses parsed by each parser
+
+# Each source is polled on its own interval, learned from how often it publishes
+POLL_MIN_INTERVAL = float(os.environ.get('POLL_MIN_INTERVAL', 15))
+POLL_MAX_INTERVAL = float(os.environ.get('POLL_MAX_INTERVAL', 900))
+poll_scheduler = PollScheduler(min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL)
+
+# Set to false to refresh only through refresh_feeds(), as the benchmarks do
+BACKGROUND_UPDATES = os.environ.get('BACKGROUND_UPDATES', 'true').lower() == 'true'
+
+# Sentiment of the articles analysed in a cycle is scored as one batch in worker processes,
+# keeping VADER off this process's GIL; 0 scores in-process instead
+SENTIMENT_WORKERS = int(os.environ.get('SENTIMENT_WORKERS', 2))
+sentiment_pool = None
+pending_sentiment = []  # (id, fingerprint, text, analysis, parsed article dict) waiting for a sentiment score
+
+# The same story syndicated by several sources is merged into one article listing the others
+# in `also_reported_by`; similarity is the estimated Jaccard overlap of title + summary word pairs
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.5))
+near_duplicate_index = NearDuplicateIndex(threshold=NEAR_DUPLICATE_THRESHOLD)
+
+# Leader election: 'none' runs the refresh loop in every process, 'file', 'redis' or 'auto'
+# elect a single fetcher that publishes snapshots for the other workers to consume
+LEADER_ELECTION = os.environ.get('LEADER_ELECTION', 'none').lower()
+LEADER_LOCK_FILE = os.environ.get('LEADER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'entertainment-news-fetcher.lock'))
+LEADER_LOCK_TTL = int(os.environ.get('LEADER_LOCK_TTL', 60))
+SNAPSHOT_FILE = os.environ.get('SNAPSHOT_FILE', os.path.join(tempfile.gettempdir(), 'entertainment-news-snapshot.bin'))
+SNAPSHOT_POLL_INTERVAL = float(os.environ.get('SNAPSHOT_POLL_INTERVAL', 2))
+leader_election = None
+process_epoch = uuid.uuid4().hex[:8]  # Distinguishes generations published by different processes or restarts
+
+# Related articles are grouped into stories, and stories covered by many outlets within the
+# last hour rank higher in trending
+STORY_WINDOW_HOURS = float(os.environ.get('STORY_WINDOW_HOURS', 24))
+STORY_VELOCITY_WEIGHT = float(os.environ.get('STORY_VELOCITY_WEIGHT', 0.5))
+story_clusterer = StoryClusterer(window=STORY_WINDOW_HOURS * 3600, id_prefix=process_epoch)
+
+# Trending scores decay continuously, halving every TRENDING_HALF_LIFE_HOURS; SOURCE_WEIGHTS is a
+# JSON object of per-source multipliers. The ranking keeps the best TRENDING_MAX_K stories.
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 8))
+TRENDING_MAX_K = int(os.environ.get('TRENDING_MAX_K', 100))
+TRENDING_DEFAULT_K = 20
+SOURCE_WEIGHTS = {"New York Times Entertainment": 1.5, "BBC Entertainment": 1.5}
+try:
+    SOURCE_WEIGHTS = json.loads(os.environ['SOURCE_WEIGHTS']) if os.environ.get('SOURCE_WEIGHTS') else SOURCE_WEIGHTS
+except ValueError as e:
+    logging.error(f"Ignoring invalid SOURCE_WEIGHTS: {str(e)}")
+trending_ranker = TrendingRanker(half_life_hours=TRENDING_HALF_LIFE_HOURS, source_weights=SOURCE_WEIGHTS,
+                                 story_velocity_weight=STORY_VELOCITY_WEIGHT, max_k=TRENDING_MAX_K)
+shared_snapshot = None  # MappedSnapshot of SNAPSHOT_FILE when using file-based election
+
+# Feed registry: FEED_REGISTRY is a JSON file or SQLite database listing the feeds with a weight, poll interval,
+# category hints and enabled flag each, re-read when it changes; unset, the built-in RSS_FEEDS are used.
+# FETCH_SHARDS splits the enabled feeds between that many fetchers by a hash of their name. This process polls
+# shard FETCH_SHARD; shard 0 builds the snapshots from the changed feeds the other shards queue in Redis.
+FEED_REGISTRY = os.environ.get('FEED_REGISTRY')
+FETCH_SHARDS = max(1, int(os.environ.get('FETCH_SHARDS', 1)))
+FETCH_SHARD = int(os.environ.get('FETCH_SHARD', 0))
+if not 0 <= FETCH_SHARD < FETCH_SHARDS:
+    raise ValueError(f"FETCH_SHARD must be between 0 and FETCH_SHARDS - 1, got {FETCH_SHARD}")
+if FETCH_SHARDS > 1 and redis_client is None:
+    logging.warning("FETCH_SHARDS needs Redis to hand changed feeds to the snapshot builder, fetching every feed here")
+    FETCH_SHARDS, FETCH_SHARD = 1, 0
+SNAPSHOT_BUILDER = FETCH_SHARD == 0
+BUILT_IN_FEEDS = dict(RSS_FEEDS)
+feed_registry = {}  # Every registered Feed by name, disabled ones included
+owned_feeds = []  # Names of the enabled feeds this process polls
+registry_mtime = None
+registry_loaded_at = 0
+
+# Feeds whose articles changed wait in this queue until the snapshot builder takes them, so a cycle in
+# which few feeds changed builds nothing, and one in which some did only processes their new records
+feed_queue = RedisFeedQueue(redis_client) if FETCH_SHARDS > 1 else FeedQueue()
+changed_sources = set()  # Sources whose articles changed since fetch_all_feeds last queued them
+remote_feeds_loaded = False  # Whether the builder has read the latest articles of every other shard's feeds
+
+# Work derived from each article record, reused while the same record stays in the feed
+merged_records = RecordCache()  # canonical record -> (also_reported_by, merged record)
+story_records = RecordCache()  # record -> (story id, record carrying it)
+indexed_terms = RecordCache()  # record -> its distinct search terms
+encoded_articles = RecordCache()  # record -> its JSON in the snapshot file
+
+# Common responses rendered once per snapshot generation
+PRERENDER_RSS_SIZES = (25, 30)  # Default page size and the one the dashboard uses
+PRERENDER_RSS_PAGES = 3
+
+# Persistent article history ('' disables it)
+ARTICLE_DB_PATH = os.environ.get('ARTICLE_DB_PATH', 'articles.db')
+ARTICLE_RETENTION_DAYS = int(os.environ.get('ARTICLE_RETENTION_DAYS', 180))
+article_store = None
+last_prune_time = 0
+
+# Where the caches were restored from at boot ('disk', 'redis' or None)
+warm_start_source = None
+
+# Server-Sent Events: diffs of the last snapshots this process adopted, for /stream resume
+STREAM_BUFFER_SIZE = int(os.environ.get('STREAM_BUFFER_SIZE', 100))
+STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT', 15))
+STREAM_RETRY_MS = 5000
+event_stream = EventStream(buffer_size=STREAM_BUFFER_SIZE)
+
+# Duration and input/output sizes of every refresh pipeline stage, for the last cycles
+pipeline_metrics = PipelineMetrics(buffer_size=int(os.environ.get('PIPELINE_METRICS_CYCLES', 50)))
+
+# Derived analysis fields of already-seen articles, so only new or edited entries are re-analysed
+analysis_cache = AnalysisCache(max_size=int(os.environ.get('ANALYSIS_CACHE_SIZE', 5000)))
+
+# Prometheus metrics served on /metrics; observations are queued without locks and folded when scraped
+metrics = MetricsRegistry()
+fetch_duration = metrics.histogram('news_fetch_duration_seconds', 'Time to fetch and parse a feed, 304 responses included',
+                                   (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20), ('source',))
+fetch_bytes = metrics.histogram('news_fetch_response_bytes', 'Body size of full feed responses',
+                                (1024, 4096, 16384, 65536, 262144, 1048576, 4194304), ('source',))
+parse_duration = metrics.histogram('news_feed_parse_duration_seconds', 'Time to parse the entries of a full feed response',
+                                   (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1), ('source', 'parser'))
+analysis_duration = metrics.histogram('news_article_analysis_seconds', 'Analysis time per new or edited article, by step',
+                                      (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01), ('step',))
+cycle_duration = metrics.histogram('news_refresh_cycle_duration_seconds', 'Duration of refresh cycles',
+                                   (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60))
+stage_duration = metrics.histogram('news_pipeline_stage_duration_seconds', 'Duration of each refresh pipeline stage',
+                                   (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 20), ('stage',))
+request_duration = metrics.histogram('news_http_request_duration_seconds', 'Time to handle a request until its response is returned',
+                                     (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1), ('endpoint', 'status'))
+response_bytes = metrics.histogram('news_http_response_bytes', 'Size of response bodies, streams excluded',
+                                   (256, 1024, 4096, 16384, 65536, 262144, 1048576), ('endpoint',))
+rendered_lookups = metrics.counter('news_rendered_response_lookups_total',
+                                   'Requests for a pre-rendered body: hit when the snapshot had it', ('result',))
 
 # Constants for article categorization and processing
 CATEGORIES = {
@@ -96,6 +289,14 @@ BREAKING_KEYWORDS = [
     "exclusive", "update", "emergency", "crisis", "just announced", "happening now"
 ]
 
+# Optional JSON file of user keyword sets, merged over the tables above and re-read when it changes
+KEYWORDS_FILE = os.environ.get('KEYWORDS_FILE')
+keywords_mtime = None
+
+# Keyword tables compiled into single-pass whole-word matchers
+category_matcher = KeywordMatcher(CATEGORIES)
+breaking_matcher = KeywordMatcher.from_keywords(BREAKING_KEYWORDS)
+
 # Custom HTTP headers to avoid being blocked
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -115,51 +316,160 @@ def get_session():
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["GET"]
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    # Keep a connection pool for every publisher so none is evicted between cycles
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=max(10, len(owned_feeds)), pool_maxsize=FETCH_WORKERS)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     session.headers.update(HEADERS)
     return session
 
-def detect_categories(text):
-    """Categorize an article based on its content"""
-    text = text.lower()
-    categories = []
+def build_keyword_matchers():
+    """Compile the category and breaking-news matchers, merging in KEYWORDS_FILE if set"""
+    categories = dict(CATEGORIES)
+    breaking = BREAKING_KEYWORDS
+    
+    if KEYWORDS_FILE:
+        try:
+            file_categories, file_breaking = load_keyword_file(KEYWORDS_FILE)
+            # Categories in the file replace the built-in keywords of the same name or add new ones
+            categories.update(file_categories)
+            if file_breaking is not None:
+                breaking = file_breaking
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load keywords from {KEYWORDS_FILE}, using the built-in tables: {str(e)}")
+    
+    return KeywordMatcher(categories), KeywordMatcher.from_keywords(breaking)
+
+def refresh_keyword_matchers():
+    """Recompile the keyword matchers if KEYWORDS_FILE changed since they were built"""
+    global category_matcher, breaking_matcher, keywords_mtime
+    
+    if not KEYWORDS_FILE:
+        return
+    try:
+        mtime = os.path.getmtime(KEYWORDS_FILE)
+    except OSError:
+        mtime = None
+    if mtime == keywords_mtime:
+        return
+    
+    keywords_mtime = mtime
+    category_matcher, breaking_matcher = build_keyword_matchers()
+    logger.info(f"Loaded keyword tables: {len(category_matcher.labels)} categories")
+
+def build_feed_registry():
+    """Return {name: Feed} read from FEED_REGISTRY, or the built-in feeds if it is unset
+
+    A registry that can't be read keeps the feeds already loaded.
+    """
+    if FEED_REGISTRY:
+        try:
+            return load_feed_registry(FEED_REGISTRY, default_weights=SOURCE_WEIGHTS)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load feeds from {FEED_REGISTRY}, keeping the current feeds: {str(e)}")
+            if feed_registry:
+                return feed_registry
     
-    for category, keywords in CATEGORIES.items():
-        for keyword in keywords:
-            if keyword.lower() in text:
-                categories.append(category)
-                break
+    return {name: Feed(name, url, weight=SOURCE_WEIGHTS.get(name, 1.0)) for name, url in BUILT_IN_FEEDS.items()}
+
+def apply_feed_registry(feeds):
+    """Fetch, weight and schedule the feeds of a registry, polling here only those of this shard"""
+    global feed_registry, RSS_FEEDS, owned_feeds, registry_loaded_at
+    
+    trending_ranker.source_weights = {name: feed.weight for name, feed in feeds.items()}
+    poll_scheduler.set_fixed_intervals({name: feed.poll_interval for name, feed in feeds.items() if feed.poll_interval})
+    feed_registry = feeds
+    RSS_FEEDS = {name: feed.url for name, feed in feeds.items() if feed.enabled}
+    owned_feeds = [name for name in RSS_FEEDS if shard_of(name, FETCH_SHARDS) == FETCH_SHARD]
+    registry_loaded_at = time.time()
+
+def refresh_feed_registry():
+    """Load the feed registry, and load it again whenever FEED_REGISTRY changes"""
+    global registry_mtime
     
-    return list(set(categories)) or ["General"]
+    mtime = None
+    if FEED_REGISTRY:
+        try:
+            mtime = os.path.getmtime(FEED_REGISTRY)
+        except OSError:
+            mtime = None
+    if feed_registry and mtime == registry_mtime:
+        return
+    
+    registry_mtime = mtime
+    apply_feed_registry(build_feed_registry())
+    logger.info(f"Loaded feed registry: {len(RSS_FEEDS)} of {len(feed_registry)} feeds enabled, "
+                f"{len(owned_feeds)} polled by fetcher shard {FETCH_SHARD + 1} of {FETCH_SHARDS}")
+
+def with_category_hints(source_name, categories):
+    """Add the registry's category hints for a source to the categories detected in one of its articles"""
+    feed = feed_registry.get(source_name)
+    if feed is None or not feed.categories:
+        return list(categories)
+    detected = [category for category in categories if category != "General"]
+    return detected + [category for category in feed.categories if category not in detected]
+
+def detect_categories(text):
+    """Categorize an article based on its content"""
+    return category_matcher.match(text) or ["General"]
 
 def calculate_sentiment(text):
-    """Calculate sentiment score for text"""
+    """Calculate the compound sentiment score of text in this process"""
     try:
-        sentiment = sia.polarity_scores(text)
-        if sentiment['compound'] >= 0.05:
-            return "positive"
-        elif sentiment['compound'] <= -0.05:
-            return "negative"
-        else:
-            return "neutral"
+        return sia.polarity_scores(text)['compound']
     except Exception as e:
         logger.error(f"Error calculating sentiment: {str(e)}")
-        return "neutral"
+        return 0.0
+
+def score_sentiments(texts):
+    """Return the compound sentiment score of each text, scored as one batch"""
+    if sentiment_pool is None:
+        return [calculate_sentiment(text) for text in texts]
+    return sentiment_pool.score(texts)
+
+def score_pending_sentiment():
+    """Score every article analysed since the last call, cache the completed analysis and update its stored record
+
+    Sources whose records got their scores are marked changed, so the scored records are queued.
+    """
+    global pending_sentiment
+    
+    with cache_lock:
+        pending, pending_sentiment = pending_sentiment, []
+    if not pending:
+        return
+    
+    start_time = time.time()
+    scores = score_sentiments([text for _, _, text, _, _ in pending])
+    analysis_duration.observe((time.time() - start_time) / len(pending), 'sentiment', count=len(pending))
+    
+    scored = {}  # source -> {article id: parsed article}
+    for (article_id, fingerprint, _, analysis, article), score in zip(pending, scores):
+        analysis['sentiment_score'] = article['sentiment_score'] = score
+        analysis['sentiment'] = article['sentiment'] = sentiment_label(score)
+        analysis_cache.put(article_id, fingerprint, analysis)
+        scored.setdefault(article['source'], {})[article_id] = article
+    
+    with cache_lock:
+        for source_name, articles in scored.items():
+            records = source_articles.get(source_name)
+            if records:
+                source_articles[source_name] = [with_sentiment(record, articles.get(record.id)) for record in records]
+                changed_sources.add(source_name)
+    
+    logger.info(f"Scored sentiment of {len(pending)} articles in {time.time() - start_time:.2f} seconds")
+
+def with_sentiment(record, article):
+    """Return `record` with the sentiment scored for `article`, the parsed entry it was frozen from, if any"""
+    if article is None or (record.title, record.summary) != (article['title'], article['summary']):
+        return record
+    if (record.sentiment, record.sentiment_score) == (article['sentiment'], article['sentiment_score']):
+        return record
+    return record.replace(sentiment=article['sentiment'], sentiment_score=article['sentiment_score'])
 
 def is_breaking_news(title, summary):
     """Detect if an article is breaking news"""
-    combined_text = (title + " " + summary).lower()
-    for keyword in BREAKING_KEYWORDS:
-        if keyword.lower() in combined_text:
-            return True
-    return False
-
-def generate_article_hash(title, link):
-    """Generate a unique hash for article deduplication"""
-    content = (title + link).encode('utf-8')
-    return hashlib.md5(content).hexdigest()
+    return breaking_matcher.search(title + " " + summary)
 
 def extract_image_url(entry):
     """Extract image URL from an RSS entry"""
@@ -197,42 +507,113 @@ def extract_image_url(entry):
     
     return None
 
+def conditional_headers(source_name):
+    """Build the validator headers for a source, sent only while we still hold the articles they describe"""
+    headers = {}
+    validators = feed_validators.get(source_name)
+    if validators and source_articles.get(source_name):
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
 def fetch_rss_feed(source_name, feed_url, session):
     """Fetch and parse an RSS feed with enhanced processing"""
+    try:
+        with session.get(feed_url, timeout=10, headers=conditional_headers(source_name), stream=True) as response:
+            received = [0]
+            chunks = count_bytes(response.iter_content(chunk_size=FEED_CHUNK_SIZE), received)
+            articles = parse_feed_response(source_name, response.status_code, response.headers, chunks)
+            
+            # Read past the entries we kept without parsing, so the connection returns to the pool
+            for _ in chunks:
+                pass
+            if response.status_code == 200:
+                fetch_bytes.observe(received[0], source_name)
+            return articles
+    except Exception as e:
+        return record_fetch_error(source_name, e)
+
+def count_bytes(chunks, received):
+    """Yield the body chunks, adding their sizes to received[0]"""
+    for chunk in chunks:
+        received[0] += len(chunk)
+        yield chunk
+
+def record_fetch_error(source_name, error):
+    """Log a failed fetch and mark the source as failing; returns None, the articles of a failed fetch"""
+    error_msg = str(error)
+    logger.error(f"Error fetching feed {source_name}: {error_msg}")
+    health_status["failed_sources"][source_name] = error_msg
+    return None
+
+def parse_feed_response(source_name, status_code, headers, chunks):
+    """Turn a feed response from either fetch engine into articles, raising on HTTP errors
+
+    `chunks` is an iterable of body bytes; the streaming parser only reads as much
+    of it as the first FEED_MAX_ENTRIES entries need.
+    """
     global health_status
     
-    try:
-        response = session.get(feed_url, timeout=10)
-        response.raise_for_status()
+    # Feed unchanged since the last cycle: skip parsing and analysis entirely
+    if status_code == 304:
+        with cache_lock:
+            conditional_get_stats['hits'] += 1
+            articles = source_articles.get(source_name, [])
+        if source_name in health_status["failed_sources"]:
+            del health_status["failed_sources"][source_name]
+        logger.info(f"{source_name} not modified, reusing {len(articles)} articles")
+        return articles
+    
+    if status_code >= 400:
+        raise RuntimeError(f"HTTP {status_code}")
+    with cache_lock:
+        conditional_get_stats['misses'] += 1
+    
+    parse_start = time.time()
+    entries, parser = parse_feed_entries(chunks, limit=FEED_MAX_ENTRIES, streaming=FEED_PARSER == 'stream')
+    parse_time = time.time() - parse_start
+    parse_duration.observe(parse_time, source_name, parser)
+    with cache_lock:
+        source_parse_time[source_name] = round(parse_time, 4)
+        parser_stats[parser] += 1
+    
+    # A feed without entries fails like an HTTP error, so the source keeps its last good articles
+    if not entries:
+        raise RuntimeError("No entries found")
         
-        feed = feedparser.parse(response.content)
+    articles = []
+    for entry in entries:  # Top FEED_MAX_ENTRIES articles per feed
+        # Extract the published date (UTC) with fallback options
+        if hasattr(entry, 'published_parsed') and entry.published_parsed:
+            published_struct = entry.published_parsed
+        elif hasattr(entry, 'updated_parsed') and entry.updated_parsed:
+            published_struct = entry.updated_parsed
+        else:
+            published_struct = time.gmtime()
+        published = time.strftime('%Y-%m-%d %H:%M:%S', published_struct)
         
-        # Check if the feed was successfully parsed
-        if not feed.entries:
-            logger.warning(f"No entries found in feed: {source_name}")
-            health_status["failed_sources"][source_name] = "No entries found"
-            return []
-            
-        articles = []
-        for entry in feed.entries[:15]:  # Get top 15 articles per feed for better coverage
-            # Extract the published date with fallback options
-            published = None
-            if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                published = time.strftime('%Y-%m-%d %H:%M:%S', entry.published_parsed)
-            elif hasattr(entry, 'updated_parsed') and entry.updated_parsed:
-                published = time.strftime('%Y-%m-%d %H:%M:%S', entry.updated_parsed)
-            else:
-                published = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # Extract summary with fallback to description or content
+        summary = ""
+        if hasattr(entry, 'summary'):
+            summary = entry.summary
+        elif hasattr(entry, 'description'):
+            summary = entry.description
+        elif hasattr(entry, 'content') and entry.content:
+            summary = entry.content[0].value
+        
+        # Generate unique hash for deduplication
+        article_hash = generate_article_hash(entry.title, entry.link)
+        
+        # Reuse the analysis of this entry if neither its content nor the keyword tables changed
+        fingerprint = content_fingerprint(entry.title, summary, category_matcher.digest, breaking_matcher.digest)
+        analysis = analysis_cache.get(article_hash, fingerprint)
+        full_text = None
+        
+        if analysis is None:
+            analysis_start = time.perf_counter()
             
-            # Extract summary with fallback to description or content
-            summary = ""
-            if hasattr(entry, 'summary'):
-                summary = entry.summary
-            elif hasattr(entry, 'description'):
-                summary = entry.description
-            elif hasattr(entry, 'content') and entry.content:
-                summary = entry.content[0].value
-                
             # Clean up HTML from summary (simplified approach)
             summary_text = re.sub(r'<.*?>', '', summary)
             summary_text = summary_text[:250] + '...' if len(summary_text) > 250 else summary_text
@@ -240,88 +621,201 @@ def fetch_rss_feed(source_name, feed_url, session):
             # Get full text for analysis
             full_text = entry.title + " " + summary_text
             
-            # Generate unique hash for deduplication
-            article_hash = generate_article_hash(entry.title, entry.link)
-            
-            # Extract image URL if available
-            image_url = extract_image_url(entry)
-            
-            # Check if it's breaking news
-            breaking = is_breaking_news(entry.title, summary_text)
-            
-            # Calculate sentiment
-            sentiment = calculate_sentiment(full_text)
-            
-            # Categorize the article
-            categories = detect_categories(full_text)
-            
-            article = {
-                'id': article_hash,
-                'title': entry.title,
-                'link': entry.link,
-                'source': source_name,
-                'published_date': published,
+            # Sentiment is filled in when the cycle's new articles are scored as a batch
+            analysis = {
                 'summary': summary_text,
-                'sentiment': sentiment,
-                'categories': categories,
-                'breaking_news': breaking,
-                'image_url': image_url,
-                'popularity': 0  # Initial popularity score
+                'image_url': extract_image_url(entry),
+                'breaking_news': is_breaking_news(entry.title, summary_text),
+                'sentiment': "neutral",
+                'sentiment_score': 0.0,
+                'categories': detect_categories(full_text)
             }
-            articles.append(article)
-            
-        # Remove source from failed sources if successful
-        if source_name in health_status["failed_sources"]:
-            del health_status["failed_sources"][source_name]
-            
-        logger.info(f"Successfully fetched {len(articles)} articles from {source_name}")
-        return articles
+            analysis_duration.observe(time.perf_counter() - analysis_start, 'extract')
         
-    except Exception as e:
-        error_msg = str(e)
-        logger.error(f"Error fetching feed {source_name}: {error_msg}")
-        health_status["failed_sources"][source_name] = error_msg
-        return []
+        article = {
+            'id': article_hash,
+            'title': entry.title,
+            'link': entry.link,
+            'source': source_name,
+            'published_date': published,
+            'published_ts': calendar.timegm(published_struct),
+            'summary': analysis['summary'],
+            'sentiment': analysis['sentiment'],
+            'sentiment_score': analysis['sentiment_score'],
+            'categories': with_category_hints(source_name, analysis['categories']),
+            'breaking_news': analysis['breaking_news'],
+            'image_url': analysis['image_url'],
+            'popularity': 0  # Initial popularity score
+        }
+        articles.append(article)
+        
+        if full_text is not None:
+            with cache_lock:
+                pending_sentiment.append((article_hash, fingerprint, full_text, analysis, article))
+        
+    # Remove source from failed sources if successful
+    if source_name in health_status["failed_sources"]:
+        del health_status["failed_sources"][source_name]
+    
+    # Remember validators so the next poll can be answered with a 304
+    feed_validators[source_name] = {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified')
+    }
+        
+    logger.info(f"Successfully fetched {len(articles)} articles from {source_name}")
+    return articles
 
-def process_article_for_api(article):
-    """Ensure an article has all required fields for the frontend"""
-    # Create a copy to avoid modifying the original
-    processed = article.copy()
+def fetch_source(source_name, feed_url):
+    """Fetch a single source with the requests engine and record its latency and articles"""
+    start_time = time.time()
+    articles = fetch_rss_feed(source_name, feed_url, http_session)
+    record_source_result(source_name, articles, time.time() - start_time)
+    return articles
+
+def finish_async_fetch(source_name, start_time, result):
+    """Parse a response of the async engine and record it like fetch_source does"""
+    try:
+        if result.error is not None:
+            raise result.error
+        if result.status_code == 200:
+            fetch_bytes.observe(len(result.content), source_name)
+        articles = parse_feed_response(source_name, result.status_code, result.headers, [result.content])
+    except Exception as e:
+        articles = record_fetch_error(source_name, e)
     
-    # Ensure required fields exist
-    if 'id' not in processed:
-        processed['id'] = generate_article_hash(processed.get('title', ''), processed.get('link', ''))
+    record_source_result(source_name, articles, time.time() - start_time)
+    return articles
+
+def start_fetch(source_name, feed_url):
+    """Start fetching a source on the configured engine and return a future of its articles"""
+    if async_fetcher is None:
+        return fetch_executor.submit(fetch_source, source_name, feed_url)
+    
+    return async_fetcher.submit(feed_url, headers=conditional_headers(source_name),
+                                on_result=functools.partial(finish_async_fetch, source_name, time.time()),
+                                executor=fetch_executor)
+
+def article_keys(articles):
+    """What a feed's articles look like to readers, for telling a changed feed from a re-sent one"""
+    return [(a['id'], a['published_date'], a['summary'], tuple(a['categories'])) for a in articles]
+
+def freeze_articles(articles, previous):
+    """Turn parsed articles into records, reusing each of the `previous` records an article is identical to
+
+    Unchanged articles of a changed feed then keep their identity, which later
+    stages use to skip them.
+    """
+    stored = {record.id: record for record in previous}
+    frozen = []
+    for article in articles:
+        if isinstance(article, Article):
+            frozen.append(article)
+            continue
+        record = Article.from_dict(article)
+        previous_record = stored.get(record.id)
+        frozen.append(previous_record if previous_record == record else record)
+    return frozen
+
+def record_source_result(source_name, articles, elapsed_time):
+    """Keep a source's latest articles and fetch latency, and schedule its next poll
+
+    Sources whose articles changed are marked for fetch_all_feeds to queue. A
+    304, or a full response with the same entries, keeps the stored records;
+    so does a failed fetch, whose `articles` are None. Parsed articles are stored
+    as records right away, so a fetch finishing after the cycle deadline never
+    leaves dicts behind; score_pending_sentiment fills in their sentiment later.
+    """
+    fetch_duration.observe(elapsed_time, source_name)
+    with cache_lock:
+        previous = source_articles.get(source_name, [])
+        source_latency[source_name] = round(elapsed_time, 3)
+        if articles is None:
+            articles = previous
+        elif articles is not previous and article_keys(articles) != article_keys(previous):
+            source_articles[source_name] = freeze_articles(articles, previous)
+            changed_sources.add(source_name)
+    
+    previous_ids = {a['id'] for a in previous}
+    new_articles = sum(1 for a in articles if a['id'] not in previous_ids)
+    poll_scheduler.record(source_name, new_articles, failed=source_name in health_status["failed_sources"])
+
+def fetch_all_feeds(source_names):
+    """Fetch the given sources concurrently, waiting at most FETCH_DEADLINE seconds
+
+    Returns {source name: article records} of the sources whose articles changed,
+    including those of late fetches from earlier cycles, after queueing them for
+    the snapshot builder.
+    """
+    global changed_sources
+    
+    futures = {}
+    for source_name in source_names:
+        feed_url = RSS_FEEDS[source_name]
+        # Don't pile up requests against a host that is still answering the previous cycle
+        previous = in_flight_fetches.get(source_name)
+        if previous is not None and not previous.done():
+            logger.warning(f"Previous fetch of {source_name} is still running, skipping it this cycle")
+            continue
+        
+        future = start_fetch(source_name, feed_url)
+        in_flight_fetches[source_name] = future
+        futures[future] = source_name
     
-    if 'categories' not in processed:
-        processed['categories'] = ["General"]
-    elif not isinstance(processed['categories'], list):
-        processed['categories'] = [processed['categories']]
+    done, not_done = wait(futures, timeout=FETCH_DEADLINE)
     
-    if 'breaking_news' not in processed:
-        processed['breaking_news'] = False
+    # Slow sources finish in the background; until then they keep their last good articles
+    for future in not_done:
+        logger.warning(f"{futures[future]} missed the {FETCH_DEADLINE:.0f}s cycle deadline, keeping last good articles")
     
-    if 'sentiment' not in processed:
-        processed['sentiment'] = 'neutral'
+    # Score the articles of every finished fetch before taking them; late fetches are taken next cycle
+    score_pending_sentiment()
     
-    if 'image_url' not in processed:
-        processed['image_url'] = None
+    with cache_lock:
+        changed, changed_sources = changed_sources, set()
+        collected = {name: source_articles.get(name, []) for name in changed}
+        latency_report = ", ".join(f"{name}: {source_latency[name]:.2f}s" for name in source_names if name in source_latency)
     
-    # Ensure title, summary, and other text fields are strings
-    for field in ['title', 'summary', 'source']:
-        if field not in processed:
-            processed[field] = ""
-        elif processed[field] is None:
-            processed[field] = ""
+    logger.info(f"Per-source fetch latency: {latency_report}")
     
-    # Ensure link is valid
-    if 'link' not in processed or not processed['link']:
-        processed['link'] = "#"
+    feed_queue.push(collected)
+    return collected
+
+def take_changed_feeds():
+    """Take the feeds queued as changed, storing the articles other shards fetched; returns their names"""
+    global remote_feeds_loaded
     
-    # Validate dates
-    if 'published_date' not in processed or not processed['published_date']:
-        processed['published_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        # A builder that just started, or took over, first reads every feed the other shards have stored
+        changed = feed_queue.drain(everything=not remote_feeds_loaded)
+    except Exception as e:
+        logger.error(f"Error reading the changed feed queue: {str(e)}")
+        remote_feeds_loaded = False
+        return set()
+    remote_feeds_loaded = True
     
-    return processed
+    owned = set(owned_feeds)
+    with cache_lock:
+        for source_name, records in changed.items():
+            if source_name not in owned:
+                source_articles[source_name] = records
+    return set(changed)
+
+def collect_articles():
+    """Return the latest articles of every enabled feed, fetched here or by another shard"""
+    # A fetch that finished after its cycle's deadline may still be waiting for its sentiment
+    score_pending_sentiment()
+    with cache_lock:
+        return [article for source_name in RSS_FEEDS for article in source_articles.get(source_name, ())]
+
+def snapshot_outdated(changed):
+    """Whether to build the next snapshot: a feed changed, the registry was reloaded, or the served one got old
+
+    Rebuilding at least every POLL_MAX_INTERVAL keeps story velocities and expiry moving while no feed changes.
+    """
+    published_at = local_snapshot.extras.get('published_at')
+    return (bool(changed) or not published_at or published_at < registry_loaded_at
+            or time.time() - published_at > POLL_MAX_INTERVAL)
 
 def deduplicate_articles(articles):
     """Remove duplicate articles based on content similarity"""
@@ -339,8 +833,8 @@ def deduplicate_articles(articles):
             # If this is a breaking news but the original isn't, prioritize this one
             if article['breaking_news'] and not unique_articles[article_id]['breaking_news']:
                 unique_articles[article_id] = article
-            # Or if this is from a more reputable source (simple implementation)
-            elif "New York Times" in article['source'] or "BBC" in article['source']:
+            # Or if this is from a more heavily weighted source
+            elif trending_ranker.source_weight(article['source']) > trending_ranker.source_weight(unique_articles[article_id]['source']):
                 unique_articles[article_id] = article
             
             duplicates += 1
@@ -349,57 +843,46 @@ def deduplicate_articles(articles):
     logger.info(f"Removed {duplicates} duplicate articles")
     return list(unique_articles.values())
 
-def update_trending_score(articles):
-    """Calculate trending score for articles based on recency and source"""
-    trending_articles = []
-    current_time = datetime.now()
+def merge_near_duplicates(articles):
+    """Collapse the same story from several sources into its earliest article
+
+    The other copies are listed in the canonical article's `also_reported_by`.
+    """
+    if NEAR_DUPLICATE_THRESHOLD >= 1:
+        return articles
     
-    for article in articles:
-        # Parse published date
-        try:
-            pub_date = datetime.strptime(article['published_date'], '%Y-%m-%d %H:%M:%S')
-            # Calculate hours since publication
-            hours_ago = (current_time - pub_date).total_seconds() / 3600
-            
-            # Base score calculation (recency-based)
-            if hours_ago < 1:
-                time_score = 10
-            elif hours_ago < 3:
-                time_score = 8
-            elif hours_ago < 6:
-                time_score = 6
-            elif hours_ago < 12:
-                time_score = 4
-            elif hours_ago < 24:
-                time_score = 2
-            else:
-                time_score = 1
-                
-            # Adjust score based on source reputation (simple implementation)
-            source_bonus = 1.0
-            if "New York Times" in article['source'] or "BBC" in article['source']:
-                source_bonus = 1.5
-            
-            # Breaking news bonus
-            breaking_bonus = 3.0 if article['breaking_news'] else 1.0
-            
-            # Calculate final score
-            article['trending_score'] = time_score * source_bonus * breaking_bonus
-            trending_articles.append(article)
-            
-        except Exception as e:
-            logger.error(f"Error calculating trending score: {str(e)}")
-            article['trending_score'] = 0
-            trending_articles.append(article)
+    groups = near_duplicate_index.update(articles, lambda a: f"{a.get('title', '')} {a.get('summary', '')}")
+    if not groups:
+        return articles
     
-    # Sort by trending score
-    trending_articles.sort(key=lambda x: x['trending_score'], reverse=True)
-    return trending_articles[:20]  # Return top 20 trending
+    by_id = {article['id']: article for article in articles}
+    canonical_of = {}
+    merged_records.rotate()
+    for group in groups:
+        members = sorted((by_id[article_id] for article_id in group),
+                         key=lambda a: (not a['breaking_news'], a.get('published_date', ''), a['id']))
+        also_reported_by = [{'id': a['id'], 'source': a['source'], 'title': a['title'], 'link': a['link']} for a in members[1:]]
+        # Keep last cycle's merged record while the story and its copies are unchanged
+        merged = merged_records.get(members[0])
+        if merged is None or merged[0] != also_reported_by:
+            merged = merged_records.put(members[0], (also_reported_by, members[0].replace(also_reported_by=also_reported_by)))
+        canonical = merged[1]
+        for article in members:
+            canonical_of[article['id']] = canonical
+    
+    merged = []
+    for article in articles:
+        canonical = canonical_of.get(article['id'])
+        if canonical is None:
+            merged.append(article)
+        elif canonical['id'] == article['id']:
+            merged.append(canonical)
+    
+    logger.info(f"Merged {len(articles) - len(merged)} near-duplicate articles into {len(groups)} stories")
+    return merged
 
-def update_source_stats(articles):
-    """Update statistics about sources"""
-    global source_stats
-    
+def build_source_stats(articles):
+    """Return the source statistics with this cycle's articles added"""
     # Count articles per source
     source_counts = Counter([article['source'] for article in articles])
     
@@ -417,29 +900,29 @@ def update_source_stats(articles):
         
         sentiment_counts[source][sentiment] += 1
     
-    # Update the global stats
-    with cache_lock:
-        for source in source_counts:
-            if source not in source_stats:
-                source_stats[source] = {
-                    'total_articles': 0,
-                    'breaking_news': 0,
-                    'sentiment': {'positive': 0, 'negative': 0, 'neutral': 0}
-                }
-            
-            source_stats[source]['total_articles'] += source_counts[source]
-            source_stats[source]['breaking_news'] += breaking_counts.get(source, 0)
-            
-            if source in sentiment_counts:
-                for sentiment_type in ['positive', 'negative', 'neutral']:
-                    source_stats[source]['sentiment'][sentiment_type] += sentiment_counts[source].get(sentiment_type, 0)
-
-def update_category_cache(articles):
-    """Update the category cache with articles by category"""
-    global category_cache
+    # Add to a copy of the stats; published snapshots keep referencing the previous totals
+    stats = {source: dict(totals, sentiment=dict(totals['sentiment'])) for source, totals in source_stats.items()}
+    for source in source_counts:
+        if source not in stats:
+            stats[source] = {
+                'total_articles': 0,
+                'breaking_news': 0,
+                'sentiment': {'positive': 0, 'negative': 0, 'neutral': 0}
+            }
+        
+        stats[source]['total_articles'] += source_counts[source]
+        stats[source]['breaking_news'] += breaking_counts.get(source, 0)
+        
+        if source in sentiment_counts:
+            for sentiment_type in ['positive', 'negative', 'neutral']:
+                stats[source]['sentiment'][sentiment_type] += sentiment_counts[source].get(sentiment_type, 0)
     
+    return stats
+
+def build_category_cache(articles):
+    """Group articles by category, newest first"""
     # Initialize category dictionary
-    categories_dict = {category: [] for category in CATEGORIES.keys()}
+    categories_dict = {category: [] for category in category_matcher.labels}
     categories_dict["General"] = []  # Add General category
     
     # Add articles to their categories
@@ -458,97 +941,710 @@ def update_category_cache(articles):
         # Limit to top 50 articles per category
         categories_dict[category] = categories_dict[category][:50]
     
-    # Update the global cache thread-safely
-    with cache_lock:
-        category_cache = categories_dict
+    return categories_dict
+
+def save_to_redis(snapshot):
+    """Write the changes of a published snapshot to the Redis article layout"""
+    if redis_article_store is None:
+        return
+    
+    meta = dict(snapshot.extras)
+    meta['categories'] = [name.split(':', 1)[1] for name in snapshot.view_names() if name.startswith('category:')]
+    
+    try:
+        changed, removed = redis_article_store.write(snapshot.view('feed'), snapshot.view('trending'), meta,
+                                                     snapshot.generation)
+        logger.info(f"Redis updated: {changed} articles written, {removed} removed")
+    except Exception as e:
+        logger.error(f"Redis error: {str(e)}")
+
+def create_async_fetcher():
+    """Create the async fetch engine when FETCH_ENGINE=async, or None to use requests"""
+    if FETCH_ENGINE != 'async':
+        return None
+    
+    try:
+        fetcher = AsyncFeedFetcher(headers=HEADERS, timeout=10, max_connections=FETCH_WORKERS,
+                                   per_host_limit=FETCH_PER_HOST_LIMIT)
+        logger.info("Using the async fetch engine")
+        return fetcher
+    except ImportError:
+        logger.warning("FETCH_ENGINE=async needs httpx[http2], falling back to requests")
+        return None
+
+def create_leader_election():
+    """Create the leader election backend selected by LEADER_ELECTION, or None
+
+    With several fetcher shards, each shard elects its own fetcher.
+    """
+    mode = LEADER_ELECTION
+    if mode == 'auto':
+        mode = 'redis' if redis_client else 'file'
+    suffix = f".{FETCH_SHARD}" if FETCH_SHARDS > 1 else ''
+    
+    if mode == 'redis':
+        if redis_client:
+            return RedisLockElection(redis_client, key=leader_key(FETCH_SHARD), ttl=LEADER_LOCK_TTL)
+        logger.warning("LEADER_ELECTION=redis but Redis is not configured, falling back to a lock file")
+        mode = 'file'
+    
+    if mode == 'file':
+        try:
+            return FileLockElection(LEADER_LOCK_FILE + suffix)
+        except RuntimeError as e:
+            logger.warning(f"Leader election disabled: {str(e)}")
+    
+    return None
+
+def leader_key(shard):
+    """Redis key of the leader lease of a fetcher shard"""
+    return f"feed_fetcher_leader.{shard}" if FETCH_SHARDS > 1 else 'feed_fetcher_leader'
+
+def history_is_local():
+    """Whether the article history file of this host is the one being written
 
-def store_in_redis(key, data, expiry=3600):
-    """Store data in Redis if available"""
-    if redis_client:
+    Only the snapshot builder writes history, to its local ARTICLE_DB_PATH.
+    Processes on its host read the same file; elsewhere it is empty or stale.
+    """
+    if isinstance(leader_election, RedisLockElection):
         try:
-            redis_client.setex(key, expiry, json.dumps(data))
-            return True
+            return lease_holder_host(redis_client, leader_key(0)) == socket.gethostname()
         except Exception as e:
-            logger.error(f"Redis error: {str(e)}")
+            logger.error(f"Could not look up the snapshot builder host: {str(e)}")
+            return False
+    # Without Redis leases, followers share the builder's host; another shard may run anywhere
+    return SNAPSHOT_BUILDER
+
+def get_process_role():
+    """Describe whether this process fetches feeds itself or consumes a published snapshot"""
+    if leader_election is None:
+        return 'standalone'
+    return 'leader' if leader_election.is_leader else 'follower'
+
+def build_snapshot_extras(stories, stats, last_update):
+    """Collect the non-article state published with each snapshot (call with cache_lock held)"""
+    return {
+        'source_stats': stats,
+        'health_status': {
+            'last_successful_update': last_update,
+            'failed_sources': dict(health_status["failed_sources"])
+        },
+        'source_latency': dict(source_latency),
+        'duplicate_count': duplicate_count,
+        'stories': stories,
+        'epoch': process_epoch,
+        'feed_validators': dict(feed_validators),
+        # Lets a warm start tell which sources the served feed still holds every article of
+        'source_article_counts': {name: len(articles) for name, articles in source_articles.items()},
+        'published_at': time.time()
+    }
+
+def publish_snapshot(snapshot):
+    """Write the snapshot file shared with follower processes and used for warm starts after a restart
+
+    Followers of a Redis-elected leader read the Redis layout written by save_to_redis instead.
+    """
+    views = {name: snapshot.view(name) for name in snapshot.view_names()}
+    extras = dict(snapshot.extras)
+    extras['indexes'] = {view: index.to_dict() for view, index in snapshot.indexes.items()}
+    rendered = {key: snapshot.rendered(key) for key in snapshot.rendered_keys()}
+    
+    try:
+        encoded_articles.rotate()
+        write_snapshot(SNAPSHOT_FILE, snapshot.generation, views, extras, rendered, encoded_articles)
+        logger.info(f"Published snapshot generation {snapshot.generation}")
+    except Exception as e:
+        logger.error(f"Error publishing snapshot: {str(e)}")
+
+def current_snapshot():
+    """Return the shared memory-mapped snapshot, remapping it when a new generation was published
+
+    Only used with file-based leader election, where all workers share one host.
+    Returns None when every process keeps its own caches.
+    """
+    global shared_snapshot
+    
+    if not isinstance(leader_election, FileLockElection):
+        return None
+    
+    try:
+        snapshot = load_snapshot(SNAPSHOT_FILE, shared_snapshot)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error mapping snapshot: {str(e)}")
+        return shared_snapshot
+    
+    if snapshot is not shared_snapshot:
+        snapshot.indexes = {view: ArticleIndex.from_dict(data) for view, data in snapshot.extras.get('indexes', {}).items()}
+        shared_snapshot = snapshot
+        logger.info(f"Mapped snapshot generation {snapshot.generation}")
+        # The leader already recorded this generation when it built it
+        if not leader_election.is_leader:
+            record_stream_event(f"{snapshot.extras.get('epoch', '')}-{snapshot.generation}", list(snapshot.view('feed')))
+    return snapshot
+
+def served_snapshot():
+    """Return the snapshot requests are answered from: the shared mapping, or this process's own"""
+    snapshot = current_snapshot()
+    return snapshot if snapshot is not None else local_snapshot
+
+def apply_snapshot_state(state):
+    """Serve a snapshot's views and extras, and continue from its counters
+
+    `state` has the shape published to Redis: {'generation', 'views', 'extras'}.
+    Its article dicts are normalized into records once, here.
+    """
+    global local_snapshot, source_stats, health_status, source_latency, duplicate_count
+    
+    # The same article appears in several views; normalize it once (trending copies carry a score)
+    records = {}
+    views = {}
+    for name, articles in state['views'].items():
+        views[name] = []
+        for article in articles:
+            key = (article['id'], article.get('trending_score'))
+            if key not in records:
+                records[key] = Article.from_dict(article)
+            views[name].append(records[key])
+    feed = views.get('feed', [])
+    trending = views.get('trending', [])
+    categories = {name.split(':', 1)[1]: articles for name, articles in views.items() if name.startswith('category:')}
+    
+    extras = {key: value for key, value in state['extras'].items() if key != 'indexes'}
+    status = extras.get('health_status') or {"last_successful_update": None, "failed_sources": {}}
+    extras['health_status'] = status
+    extras.setdefault('epoch', process_epoch)
+    
+    rendered = render_common_responses(feed, trending, categories,
+                                       status["last_successful_update"] or datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    if 'indexes' in state['extras']:
+        indexes = {view: ArticleIndex.from_dict(data) for view, data in state['extras']['indexes'].items()}
+    else:
+        indexes = build_article_indexes(feed, trending)
+    
+    # The snapshot keeps the extras it was published with; the live counters continue from copies
+    with cache_lock:
+        source_stats = extras.get('source_stats', {})
+        health_status = {"last_successful_update": status["last_successful_update"],
+                         "failed_sources": dict(status.get("failed_sources", {}))}
+        source_latency = dict(extras.get('source_latency', {}))
+        duplicate_count = extras.get('duplicate_count', 0)
+    
+    local_snapshot = LocalSnapshot(state['generation'], views, extras, rendered, indexes)
+    record_stream_event(f"{extras['epoch']}-{local_snapshot.generation}", feed)
+
+def load_published_snapshot():
+    """Keep this follower in step with the leader's latest snapshot"""
+    # Followers of a file-based leader read the shared mapping directly in request handlers
+    if current_snapshot() is not None:
+        return False
+    # Without Redis there is nothing else to read until the leader's first snapshot is mapped
+    if redis_article_store is None:
+        return False
+    
+    try:
+        generation = redis_client.get(GENERATION)
+        if generation is None or int(generation) == local_snapshot.generation:
+            return False
+        state = redis_article_store.read()
+        if not state:
+            return False
+        apply_snapshot_state(state)
+    except Exception as e:
+        logger.error(f"Error loading published snapshot: {str(e)}")
+        return False
+    
+    logger.info(f"Loaded published snapshot generation {local_snapshot.generation}")
+    return True
+
+def read_disk_snapshot():
+    """Read the last snapshot written to SNAPSHOT_FILE, or None"""
+    try:
+        snapshot = load_snapshot(SNAPSHOT_FILE)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read snapshot {SNAPSHOT_FILE}: {str(e)}")
+        return None
+    
+    if snapshot is None:
+        return None
+    return {
+        'generation': snapshot.generation,
+        'views': {name: list(snapshot.view(name)) for name in snapshot.view_names()},
+        'extras': snapshot.extras
+    }
+
+def read_redis_snapshot():
+    """Read the articles last written to Redis by save_to_redis, or None"""
+    if redis_article_store is None:
+        return None
+    
+    try:
+        return redis_article_store.read()
+    except Exception as e:
+        logger.warning(f"Could not read Redis snapshot: {str(e)}")
+        return None
+
+def as_source_record(article):
+    """Return a served record as its source delivered it, without what merging and clustering added"""
+    if isinstance(article, Article):
+        return article.replace(also_reported_by=(), story_id=None) if article.also_reported_by or article.story_id else article
+    return Article.from_dict(dict(article, also_reported_by=(), story_id=None))
+
+def hydrate_caches():
+    """Serve the last known articles right after boot, before the first refresh completes"""
+    global warm_start_source
+    
+    for origin, reader in (('disk', read_disk_snapshot), ('redis', read_redis_snapshot)):
+        state = reader()
+        if not state or not state['views'].get('feed'):
+            continue
+        
+        apply_snapshot_state(state)
+        
+        # Let the first refresh revalidate each feed with a conditional GET instead of a full download.
+        # Only sources with none of their articles deduplicated or merged into another source's are
+        # complete in the feed; the others are downloaded in full, so a 304 can't keep them partial.
+        feed = local_snapshot.view('feed')
+        by_source = {}
+        for article in feed:
+            by_source.setdefault(article['source'], []).append(article)
+        counts = state['extras'].get('source_article_counts', {})
+        with cache_lock:
+            for source_name, validators in state['extras'].get('feed_validators', {}).items():
+                articles = by_source.get(source_name)
+                if articles and len(articles) == counts.get(source_name):
+                    source_articles[source_name] = [as_source_record(a) for a in articles]
+                    feed_validators[source_name] = validators
+        
+        warm_start_source = origin
+        logger.info(f"Warm start: loaded {len(feed)} articles from the {origin} snapshot")
+        return True
+    
+    logger.info("No snapshot to warm start from, waiting for the first refresh")
     return False
 
-def get_from_redis(key):
-    """Retrieve data from Redis if available"""
-    if redis_client:
+def get_articles(view):
+    """Return the articles of a view ('feed', 'trending' or 'category:<name>') for a request"""
+    return served_snapshot().view(view)
+
+def build_article_indexes(feed, trending):
+    """Build the filter indexes of the views /rss can query"""
+    return {'feed': ArticleIndex.build(feed, indexed_terms), 'trending': ArticleIndex.build(trending, indexed_terms)}
+
+def get_indexed_articles(view):
+    """Return the articles of 'feed' or 'trending' together with their index from the same snapshot"""
+    snapshot = served_snapshot()
+    articles = snapshot.view(view)
+    index = snapshot.indexes.get(view)
+    
+    # Before the first refresh there is nothing worth indexing ahead of time
+    if index is None or index.size != len(articles):
+        index = ArticleIndex.build(articles)
+    return articles, index
+
+def published_within(feed, cutoff):
+    """Return the articles of a feed view published at or after `cutoff`
+
+    The view is newest first after its breaking news, so the scan stops at the
+    first older article past them.
+    """
+    recent = []
+    for article in feed:
+        timestamp = article_timestamp(article)
+        if timestamp is not None and timestamp >= cutoff:
+            recent.append(article)
+        elif timestamp is not None and not article.get('breaking_news'):
+            break
+    return recent
+
+def rank_trending_window(k, window_hours):
+    """Rank the served articles published within the last `window_hours`, best k first, scored as the served ranking"""
+    snapshot = served_snapshot()
+    recent = published_within(snapshot.view('feed'), time.time() - window_hours * 3600)
+    # Followers of a file-based leader decode plain dicts
+    recent = [a if isinstance(a, Article) else Article.from_dict(a) for a in recent]
+    velocities = {story['id']: story['velocity'] for story in snapshot.extras.get('stories', [])}
+    return trending_ranker.rank(recent, velocities, now=snapshot.extras.get('published_at'), limit=k)
+
+def get_shared_state():
+    """Return source stats and health information for a request, as of the served snapshot"""
+    snapshot = served_snapshot()
+    state = dict(snapshot.extras)
+    state['cache_size'] = len(snapshot.view('feed'))
+    state['generation'] = snapshot.generation
+    return state
+
+def build_rss_payload(articles, page, page_size, timestamp=None):
+    """Build the paginated /rss response body for an already filtered article list"""
+    # Calculate total results and pages
+    total_results = len(articles)
+    total_pages = max(1, (total_results + page_size - 1) // page_size) if total_results > 0 else 1
+    
+    # Apply pagination
+    start_idx = min((page - 1) * page_size, total_results) if total_results > 0 else 0
+    end_idx = min(start_idx + page_size, total_results)
+    paginated_articles = list(articles[start_idx:end_idx]) if total_results > 0 else []
+    
+    return {
+        'status': 'success',
+        'timestamp': timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_results': total_results,
+        'page': page,
+        'total_pages': total_pages,
+        'page_size': page_size,
+        'articles': paginated_articles
+    }
+
+def build_list_payload(articles, timestamp=None, **fields):
+    """Build the response body of the list endpoints (/trending, /breaking, /category)"""
+    return {
+        'status': 'success',
+        'timestamp': timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        **fields,
+        'count': len(articles),
+        'articles': articles
+    }
+
+def render_json(payload):
+    """Serialize a payload to the exact bytes jsonify would send"""
+    return f"{app.json.dumps(payload)}\n".encode('utf-8')
+
+def render_common_responses(feed, trending, categories, timestamp):
+    """Pre-render the JSON bodies of the most requested views for one snapshot generation"""
+    rendered = {
+        'trending': render_json(build_list_payload(list(trending[:TRENDING_DEFAULT_K]), timestamp)),
+        'breaking': render_json(build_list_payload([a for a in feed if a.get('breaking_news', False)], timestamp))
+    }
+    
+    for category, articles in categories.items():
+        rendered[f'category:{category}'] = render_json(build_list_payload(list(articles), timestamp, category=category))
+    
+    # Unfiltered /rss pages, including the page size the dashboard asks for
+    for sort_by, articles in (('date', feed), ('trending', trending)):
+        for page_size in PRERENDER_RSS_SIZES:
+            for page in range(1, PRERENDER_RSS_PAGES + 1):
+                rendered[f'rss:{sort_by}:{page}:{page_size}'] = render_json(build_rss_payload(articles, page, page_size, timestamp))
+    
+    return rendered
+
+def get_rendered_response(key):
+    """Return a response for a pre-rendered view of the current snapshot, or None"""
+    body = served_snapshot().rendered(key)
+    rendered_lookups.inc('miss' if body is None else 'hit')
+    if body is None:
+        return None
+    return app.response_class(body, mimetype='application/json')
+
+def save_article_history(articles):
+    """Upsert the cycle's articles into the history store and prune it about once an hour"""
+    global last_prune_time
+    
+    if article_store is None:
+        return
+    
+    try:
+        article_store.upsert_articles(articles)
+        if time.time() - last_prune_time > 3600:
+            article_store.prune()
+            last_prune_time = time.time()
+    except Exception as e:
+        logger.error(f"Error saving article history: {str(e)}")
+
+def parse_time_param(value):
+    """Normalize a since/until query value to the stored published_date format, which is in UTC"""
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value), timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    
+    for time_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
         try:
-            data = redis_client.get(key)
-            if data:
-                return json.loads(data)
-        except Exception as e:
-            logger.error(f"Redis error: {str(e)}")
-    return None
+            return datetime.strptime(value, time_format).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+    
+    raise ValueError(f"Invalid time '{value}', expected YYYY-MM-DD[ HH:MM:SS] or a Unix timestamp")
 
-def update_feeds():
-    """Fetch all RSS feeds and update the cache with enhanced processing"""
-    global feed_cache, trending_cache, health_status
+def get_snapshot_version():
+    """Identify the snapshot currently served by this process as '<epoch>-<generation>'"""
+    snapshot = served_snapshot()
+    return f"{snapshot.extras.get('epoch', '')}-{snapshot.generation}"
+
+def conditional_response(view):
+    """Tag a read endpoint's successful responses with an ETag tied to the snapshot and query, answering 304 when it matches
+
+    Error responses get no ETag, so clients never cache and revalidate them.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        query_hash = hashlib.md5(request.full_path.encode('utf-8')).hexdigest()[:12]
+        etag = f"{get_snapshot_version()}-{query_hash}"
+        
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        
+        # Let browsers keep the body but revalidate it on every poll
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    return wrapper
+
+def record_stream_event(version, feed):
+    """Publish the diff between the previously adopted feed and `feed` to /stream subscribers"""
+    event = event_stream.publish(version, feed)
+    if event is not None:
+        logger.info(f"Stream event {version}: {len(event.added)} added, {len(event.updated)} updated, {len(event.removed)} removed")
+
+def format_stream_event(event_type, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = [f"id: {event_id}"] if event_id else []
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+def generate_stream(stream_filter, last_event_id):
+    """Yield a full snapshot when needed, then one diff per published snapshot, until the client leaves"""
+    yield f"retry: {STREAM_RETRY_MS}\n\n"
+    
+    events = event_stream.wait(last_event_id, 0) if last_event_id else None
+    while True:
+        if events is None:
+            # New clients, and clients whose last event is no longer buffered, start from the full view
+            last_event_id, articles = event_stream.snapshot()
+            data = json.dumps({'articles': [a for a in articles if stream_filter.matches(a)]}, separators=(',', ':'), default=dict)
+            yield format_stream_event('snapshot', data, last_event_id)
+        elif not events:
+            yield ": keepalive\n\n"
+        
+        for event in events or []:
+            data = event.render(stream_filter)
+            # Events outside the client's filters only move its Last-Event-ID forward
+            yield format_stream_event('diff', data, event.id) if data is not None else f"id: {event.id}\n\n"
+            last_event_id = event.id
+        
+        events = event_stream.wait(last_event_id, STREAM_HEARTBEAT)
+
+def with_story(article, story_id):
+    """Return the record of `article` carrying `story_id`, the same one as last cycle if neither changed"""
+    cached = story_records.get(article)
+    if cached is None or cached[0] != story_id:
+        cached = story_records.put(article, (story_id, article.replace(story_id=story_id)))
+    return cached[1]
+
+def build_next_snapshot(articles, cycle):
+    """Run a cycle's articles through the refresh pipeline and return the next generation, unpublished
+
+    Each stage is timed in `cycle`, with the number of items it took in and produced.
+    """
+    with cycle.stage('deduplicate', articles) as stage:
+        articles = deduplicate_articles(articles)
+        stage.done(articles)
+    
+    # Merge the same story reported by several sources
+    with cycle.stage('merge_near_duplicates', articles) as stage:
+        articles = merge_near_duplicates(articles)
+        stage.done(articles)
+    
+    # Group related articles into stories; only records whose story changed are replaced
+    with cycle.stage('cluster_stories', articles) as stage:
+        story_of = story_clusterer.update(articles)
+        story_records.rotate()
+        articles = [a if a.story_id == story_of.get(a.id) else with_story(a, story_of.get(a.id)) for a in articles]
+        stories = story_clusterer.stories()
+        stage.done(stories)
+    
+    # Sort by published date (newest first), breaking ties by id so every reader orders alike,
+    # then put breaking news first
+    with cycle.stage('sort', articles) as stage:
+        articles.sort(key=lambda a: (a.published_date, a.id), reverse=True)
+        feed = [a for a in articles if a.breaking_news] + [a for a in articles if not a.breaking_news]
+        stage.done(feed)
+    
+    # The ranker returns records carrying their trending_score
+    with cycle.stage('rank_trending', articles) as stage:
+        trending = trending_ranker.rank(articles, {story['id']: story['velocity'] for story in stories})
+        stage.done(trending)
+    
+    with cycle.stage('source_stats', articles) as stage:
+        stats = build_source_stats(articles)
+        stage.done(stats)
+    
+    with cycle.stage('categorize', articles) as stage:
+        categories = build_category_cache(articles)
+        stage.done(sum(len(category_articles) for category_articles in categories.values()))
+    
+    # Render the common responses and build the filter indexes once for this generation
+    update_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with cycle.stage('render', len(feed) + len(trending)) as stage:
+        rendered = render_common_responses(feed, trending, categories, update_time)
+        stage.done(rendered)
+    
+    with cycle.stage('index', len(feed) + len(trending)) as stage:
+        indexed_terms.rotate()
+        indexes = build_article_indexes(feed, trending)
+        stage.done(sum(len(index.terms) for index in indexes.values()))
+    
+    views = {'feed': feed, 'trending': trending}
+    for category, category_articles in categories.items():
+        views[f'category:{category}'] = category_articles
+    with cache_lock:
+        extras = build_snapshot_extras(stories, stats, update_time)
     
+    return LocalSnapshot(local_snapshot.generation + 1, views, extras, rendered, indexes)
+
+def changed_records(previous, current):
+    """Return the records of `current` not in `previous`; unchanged articles are the same records in both"""
+    known = {id(article) for article in previous}
+    return [article for article in current if id(article) not in known]
+
+def publish_local_snapshot(snapshot, cycle):
+    """Serve `snapshot` from this process, then hand it to stream clients, the stores and followers"""
+    global local_snapshot, source_stats
+    
+    # Requests pick the new generation up with a single reference read
+    previous_feed = local_snapshot.view('feed')
+    with cycle.stage('publish', snapshot.view('feed')) as stage:
+        local_snapshot = snapshot
+        source_stats = snapshot.extras['source_stats']
+        health_status["last_successful_update"] = snapshot.extras['health_status']['last_successful_update']
+        
+        # Push what changed to /stream subscribers
+        record_stream_event(f"{process_epoch}-{snapshot.generation}", snapshot.view('feed'))
+        stage.done(snapshot.view_names())
+    
+    # Keep every article in the persistent history, writing only the new and changed ones
+    changed_articles = changed_records(previous_feed, snapshot.view('feed'))
+    with cycle.stage('save_history', changed_articles):
+        save_article_history(changed_articles)
+    
+    # Store the changed articles in Redis if available
+    with cycle.stage('save_redis', snapshot.view('feed')):
+        save_to_redis(snapshot)
+    
+    # Hand the new snapshot to follower processes and keep it for the next warm start
+    with cycle.stage('write_snapshot', snapshot.view_names()):
+        publish_snapshot(snapshot)
+
+def refresh_feeds(source_names):
+    """Fetch the given sources and publish the next snapshot if any feed changed, returning the cycle's stage timings
+
+    Fetcher shards other than the snapshot builder only queue their changed feeds for it.
+    """
+    logger.info(f"Starting RSS feed update cycle for {len(source_names)} of {len(RSS_FEEDS)} sources")
+    start_time = time.time()
+    
+    cycle = pipeline_metrics.start_cycle()
+    
+    # Fetch the due feeds concurrently, queueing those whose articles changed
+    with cycle.stage('fetch', source_names) as stage:
+        changed = fetch_all_feeds(source_names)
+        stage.done(changed)
+    
+    # Take the changed feeds of every shard, and skip the build if none changed
+    all_articles = []
+    if SNAPSHOT_BUILDER:
+        with cycle.stage('collect') as stage:
+            if snapshot_outdated(take_changed_feeds()):
+                all_articles = collect_articles()
+            stage.done(all_articles)
+    
+    # Process only if we have articles
+    if all_articles:
+        # Build the whole next generation off to the side, then publish it in one step
+        snapshot = build_next_snapshot(all_articles, cycle)
+        publish_local_snapshot(snapshot, cycle)
+    
+    cycle.finish(local_snapshot.generation if all_articles else None)
+    elapsed_time = time.time() - start_time
+    cycle_duration.observe(elapsed_time)
+    for stage in cycle.stages:
+        stage_duration.observe(stage['seconds'], stage['name'])
+    logger.info(f"Feed update completed in {elapsed_time:.2f} seconds, {len(changed)} of {len(source_names)} sources changed, "
+                f"{len(all_articles)} articles processed, {len(local_snapshot.view('feed'))} after deduplication")
+    return cycle
+
+def refresh_delay():
+    """Seconds until the next source of this process is due, at most POLL_MIN_INTERVAL to keep leadership"""
+    delay = min(POLL_MIN_INTERVAL, max(1, poll_scheduler.seconds_until_due(owned_feeds)))
+    if FETCH_SHARDS > 1:
+        # Pick up the feeds the other shards changed, or the snapshot the builder published
+        delay = min(delay, SNAPSHOT_POLL_INTERVAL)
+    return delay
+
+def update_feeds():
+    """Fetch the due RSS feeds and publish the next snapshot, in a loop"""
     while True:
         try:
-            logger.info("Starting RSS feed update cycle")
-            start_time = time.time()
-            
-            session = get_session()
-            all_articles = []
+            # Pick up edits to the user keyword file and the feed registry
+            refresh_keyword_matchers()
+            refresh_feed_registry()
             
-            # Fetch all feeds
-            for source_name, feed_url in RSS_FEEDS.items():
-                articles = fetch_rss_feed(source_name, feed_url, session)
-                all_articles.extend(articles)
+            # Followers only consume what the elected fetcher publishes
+            if leader_election is not None and not leader_election.try_acquire():
+                load_published_snapshot()
+                time.sleep(SNAPSHOT_POLL_INTERVAL)
+                continue
             
-            # Process only if we have articles
-            if all_articles:
-                # Deduplicate articles
-                unique_articles = deduplicate_articles(all_articles)
-                
-                # Sort by published date (newest first)
-                unique_articles.sort(key=lambda x: x.get('published_date', ''), reverse=True)
-                
-                # Prioritize breaking news
-                breaking_news = [a for a in unique_articles if a['breaking_news']]
-                non_breaking = [a for a in unique_articles if not a['breaking_news']]
-                prioritized_articles = breaking_news + non_breaking
-                
-                # Process articles for API consistency
-                prioritized_articles = [process_article_for_api(a) for a in prioritized_articles]
-                
-                # Update trending articles
-                trending_articles = update_trending_score(unique_articles.copy())
-                trending_articles = [process_article_for_api(a) for a in trending_articles]
-                
-                # Update source statistics
-                update_source_stats(unique_articles)
-                
-                # Update category cache
-                update_category_cache(unique_articles)
-                
-                # Update the cache thread-safely
-                with cache_lock:
-                    feed_cache = prioritized_articles
-                    trending_cache = trending_articles
-                    health_status["last_successful_update"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                
-                # Store in Redis if available
-                store_in_redis("feed_cache", prioritized_articles)
-                store_in_redis("trending_cache", trending_articles)
-                store_in_redis("source_stats", source_stats)
-                store_in_redis("category_cache", category_cache)
+            # Only poll the sources of this shard whose interval has elapsed
+            due_sources = poll_scheduler.due(owned_feeds)
+            # The builder also runs a cycle for feeds changed by other shards, and to refresh an outdated snapshot
+            rebuild = SNAPSHOT_BUILDER and (feed_queue.pending() or (local_snapshot.generation and snapshot_outdated(())))
+            if due_sources or rebuild:
+                refresh_feeds(due_sources)
             
-            elapsed_time = time.time() - start_time
-            logger.info(f"Feed update completed in {elapsed_time:.2f} seconds, fetched {len(all_articles)} articles, {len(feed_cache)} after deduplication")
+            # Other shards serve the snapshots the builder publishes, like followers
+            if not SNAPSHOT_BUILDER:
+                load_published_snapshot()
             
-            # Sleep for 15 seconds before the next update
-            time.sleep(15)
+            # Wake up when the next source is due
+            time.sleep(refresh_delay())
             
         except Exception as e:
             logger.error(f"Error in update thread: {str(e)}")
             time.sleep(15)  # Sleep and try again even if there's an error
 
+@app.after_request
+def record_request_metrics(response):
+    """Observe the latency and body size of every request, labelled by route"""
+    # One lookup through the request proxy instead of one per attribute
+    current = request._get_current_object()
+    endpoint = current.url_rule.rule if current.url_rule is not None else 'unmatched'
+    request_duration.observe(time.perf_counter() - current.environ[REQUEST_START], endpoint, response.status_code)
+    size = response.calculate_content_length()
+    if size is not None:
+        response_bytes.observe(size, endpoint)
+    return response
+
+def cache_lookups():
+    """Hits and misses of the caches that spare work, by cache"""
+    analysis = analysis_cache.stats()
+    rendered = rendered_lookups.values()
+    return {
+        'analysis': (analysis['hits'], analysis['misses']),
+        'conditional_get': (conditional_get_stats['hits'], conditional_get_stats['misses']),
+        'rendered_response': (rendered.get(('hit',), 0), rendered.get(('miss',), 0))
+    }
+
+def snapshot_age():
+    """Seconds since the served snapshot was built, or None before the first one"""
+    published_at = served_snapshot().extras.get('published_at')
+    return round(time.time() - published_at, 3) if published_at else None
+
+metrics.counter_callback('news_cache_lookups_total', 'Cache lookups by cache and result',
+                         lambda: {(cache, result): count for cache, counts in cache_lookups().items()
+                                  for result, count in zip(('hit', 'miss'), counts)}, ('cache', 'result'))
+metrics.gauge_callback('news_cache_hit_ratio', 'Share of cache lookups that were hits',
+                       lambda: {(cache,): round(hits / (hits + misses), 4) if hits + misses else None
+                                for cache, (hits, misses) in cache_lookups().items()}, ('cache',))
+metrics.gauge_callback('news_snapshot_age_seconds', 'Seconds since the served snapshot was built', snapshot_age)
+metrics.gauge_callback('news_snapshot_generation', 'Generation of the served snapshot', lambda: served_snapshot().generation)
+metrics.gauge_callback('news_snapshot_articles', 'Articles in the served snapshot, by view',
+                       lambda: {(view,): len(served_snapshot().view(view)) for view in ('feed', 'trending')}, ('view',))
+
 @app.route('/rss', methods=['GET'])
+@conditional_response
 def get_rss():
     """API endpoint to get the latest RSS feed data with filtering options"""
     logger.info("API request received for /rss endpoint")
@@ -567,110 +1663,132 @@ def get_rss():
     page = int(request.args.get('page', 1))
     page_size = min(int(request.args.get('size', 25)), 100)  # Limit max size to 100
     
-    # Copy the current cache
-    with cache_lock:
-        if sort_by == 'trending':
-            current_cache = trending_cache.copy()
-        else:
-            current_cache = feed_cache.copy()
+    # Time-windowed queries are answered from the article history
+    since = request.args.get('since')
+    until = request.args.get('until')
+    cursor = request.args.get('cursor')
+    if since or until or cursor:
+        if article_store is None:
+            return jsonify({'status': 'error', 'message': 'Article history is not enabled'}), 503
+        if not history_is_local():
+            return jsonify({'status': 'error', 'message': 'Article history is kept on the host of the feed fetcher '
+                            'that builds snapshots; send since, until and cursor queries to that host'}), 503
+        
+        try:
+            since = parse_time_param(since) if since else None
+            until = parse_time_param(until) if until else None
+            articles, next_cursor = article_store.query(
+                since=since, until=until, source=source, category=category, sentiment=sentiment,
+                breaking_only=breaking_only, search=search_query, cursor=cursor, limit=page_size
+            )
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        logger.info(f"Returning {len(articles)} articles from history")
+        
+        return jsonify({
+            'status': 'success',
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'since': since,
+            'until': until,
+            'page_size': page_size,
+            'count': len(articles),
+            'next_cursor': next_cursor,
+            'articles': [Article.from_dict(a) for a in articles]
+        })
+    
+    # Unfiltered first pages are rendered once per snapshot
+    if not (source or category or sentiment or breaking_only or search_query):
+        rendered = get_rendered_response(f"rss:{'trending' if sort_by == 'trending' else 'date'}:{page}:{page_size}")
+        if rendered is not None:
+            return rendered
+    
+    current_cache, index = get_indexed_articles('trending' if sort_by == 'trending' else 'feed')
     
     # Debug: Log cache size
     logger.info(f"Cache size: {len(current_cache)} articles before filtering")
     
-    # Apply filters
-    filtered_articles = current_cache
-    
-    if source:
-        filtered_articles = [a for a in filtered_articles if source.lower() in a['source'].lower()]
-    
-    if category:
-        filtered_articles = [a for a in filtered_articles if category in a.get('categories', [])]
-    
-    if sentiment:
-        filtered_articles = [a for a in filtered_articles if a.get('sentiment') == sentiment]
-    
-    if breaking_only:
-        filtered_articles = [a for a in filtered_articles if a.get('breaking_news', False)]
+    # Apply filters by intersecting the snapshot's posting lists
+    positions = index.search(source=source, category=category, sentiment=sentiment,
+                             breaking_only=breaking_only, query=search_query)
+    filtered_articles = [current_cache[position] for position in positions]
     
+    # The term index narrows the candidates; the full query must still appear verbatim
     if search_query:
         query = search_query.lower()
         filtered_articles = [a for a in filtered_articles if 
                             query in a.get('title', '').lower() or 
                             query in a.get('summary', '').lower()]
     
-    # Calculate total results and pages
-    total_results = len(filtered_articles)
-    total_pages = max(1, (total_results + page_size - 1) // page_size) if total_results > 0 else 1
-    
-    # Apply pagination
-    start_idx = min((page - 1) * page_size, total_results) if total_results > 0 else 0
-    end_idx = min(start_idx + page_size, total_results)
-    paginated_articles = filtered_articles[start_idx:end_idx] if total_results > 0 else []
-    
-    # Make sure articles are fully populated
-    for article in paginated_articles:
-        # Ensure categories is always a list
-        if 'categories' not in article:
-            article['categories'] = ["General"]
-        elif not isinstance(article['categories'], list):
-            article['categories'] = [article['categories']]
-            
-        # Ensure breaking_news is always present
-        if 'breaking_news' not in article:
-            article['breaking_news'] = False
-            
-        # Ensure other required fields are present
-        if 'sentiment' not in article:
-            article['sentiment'] = 'neutral'
-        if 'image_url' not in article:
-            article['image_url'] = None
+    payload = build_rss_payload(filtered_articles, page, page_size)
     
     # Debug: Log how many articles are being returned
-    logger.info(f"Returning {len(paginated_articles)} articles after filtering and pagination")
+    logger.info(f"Returning {len(payload['articles'])} articles after filtering and pagination")
     
-    return jsonify({
-        'status': 'success',
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'total_results': total_results,
-        'page': page,
-        'total_pages': total_pages,
-        'page_size': page_size,
-        'articles': paginated_articles
-    })
+    return jsonify(payload)
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    """Server-Sent Events endpoint pushing new, updated and removed articles as snapshots are published"""
+    logger.info("Stream client connected")
+    
+    stream_filter = StreamFilter(
+        source=request.args.get('source'),
+        category=request.args.get('category'),
+        sentiment=request.args.get('sentiment'),
+        breaking_only=request.args.get('breaking', 'false').lower() == 'true',
+        query=request.args.get('q')
+    )
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    # Adopt the newest shared snapshot so its diff is buffered before we start
+    current_snapshot()
+    
+    return app.response_class(generate_stream(stream_filter, last_event_id), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/trending', methods=['GET'])
+@conditional_response
 def get_trending():
-    """API endpoint to get trending articles"""
+    """API endpoint to get trending articles, optionally the top k published within the last `window` hours"""
     logger.info("API request received for /trending endpoint")
     
-    with cache_lock:
-        current_trending = trending_cache.copy()
-    
-    # Make sure articles are fully populated
-    for article in current_trending:
-        # Ensure categories is always a list
-        if 'categories' not in article:
-            article['categories'] = ["General"]
-        elif not isinstance(article['categories'], list):
-            article['categories'] = [article['categories']]
-            
-        # Ensure breaking_news is always present
-        if 'breaking_news' not in article:
-            article['breaking_news'] = False
-            
-        # Ensure other required fields are present
-        if 'sentiment' not in article:
-            article['sentiment'] = 'neutral'
-        if 'image_url' not in article:
-            article['image_url'] = None
+    k = request.args.get('k', type=int)
+    window = request.args.get('window', type=float)
+    
+    if k is None and window is None:
+        rendered = get_rendered_response('trending')
+        if rendered is not None:
+            return rendered
+    
+    # The ranking is built once per refresh; a window's articles are ranked by themselves,
+    # since recent ones can rank below the TRENDING_MAX_K older, heavier articles kept in it
+    k = min(max(1, k or TRENDING_DEFAULT_K), TRENDING_MAX_K)
+    if window:
+        current_trending = rank_trending_window(k, window)
+    else:
+        current_trending = get_articles('trending')[:k]
     
     logger.info(f"Returning {len(current_trending)} trending articles")
     
+    return jsonify(build_list_payload(current_trending))
+
+@app.route('/stories', methods=['GET'])
+@conditional_response
+def get_stories():
+    """API endpoint to get stories: related articles grouped across sources, fastest spreading first"""
+    logger.info("API request received for /stories endpoint")
+    
+    limit = min(max(1, request.args.get('limit', 20, type=int)), 100)
+    min_sources = max(1, request.args.get('min_sources', 2, type=int))
+    
+    stories = [story for story in get_shared_state().get('stories', []) if len(story['sources']) >= min_sources]
+    
     return jsonify({
         'status': 'success',
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'count': len(current_trending),
-        'articles': current_trending
+        'count': len(stories[:limit]),
+        'stories': stories[:limit]
     })
 
 @app.route('/categories', methods=['GET'])
@@ -681,86 +1799,48 @@ def get_categories():
     return jsonify({
         'status': 'success',
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'categories': list(CATEGORIES.keys()) + ["General"]
+        'categories': category_matcher.labels + ["General"]
     })
 
 @app.route('/category/<category>', methods=['GET'])
+@conditional_response
 def get_category(category):
     """API endpoint to get articles by category"""
     logger.info(f"API request received for category: {category}")
     
-    with cache_lock:
-        if category in category_cache:
-            articles = category_cache[category].copy()
-        else:
-            articles = []
+    rendered = get_rendered_response(f'category:{category}')
+    if rendered is not None:
+        return rendered
     
-    # Make sure articles are fully populated
-    for article in articles:
-        # Ensure categories is always a list
-        if 'categories' not in article:
-            article['categories'] = [category]
-        elif not isinstance(article['categories'], list):
-            article['categories'] = [article['categories']]
-            
-        # Ensure breaking_news is always present
-        if 'breaking_news' not in article:
-            article['breaking_news'] = False
-            
-        # Ensure other required fields are present
-        if 'sentiment' not in article:
-            article['sentiment'] = 'neutral'
-        if 'image_url' not in article:
-            article['image_url'] = None
+    articles = list(get_articles(f'category:{category}'))
     
     logger.info(f"Returning {len(articles)} articles for category: {category}")
     
-    return jsonify({
-        'status': 'success',
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'category': category,
-        'count': len(articles),
-        'articles': articles
-    })
+    return jsonify(build_list_payload(articles, category=category))
 
 @app.route('/breaking', methods=['GET'])
+@conditional_response
 def get_breaking():
     """API endpoint to get breaking news articles"""
     logger.info("API request received for breaking news")
     
-    with cache_lock:
-        breaking_articles = [a for a in feed_cache if a.get('breaking_news', False)]
-    
-    # Make sure articles are fully populated
-    for article in breaking_articles:
-        # Ensure categories is always a list
-        if 'categories' not in article:
-            article['categories'] = ["General"]
-        elif not isinstance(article['categories'], list):
-            article['categories'] = [article['categories']]
-            
-        # Ensure other required fields are present
-        if 'sentiment' not in article:
-            article['sentiment'] = 'neutral'
-        if 'image_url' not in article:
-            article['image_url'] = None
+    rendered = get_rendered_response('breaking')
+    if rendered is not None:
+        return rendered
+    
+    breaking_articles = [a for a in get_articles('feed') if a.get('breaking_news', False)]
     
     logger.info(f"Returning {len(breaking_articles)} breaking news articles")
     
-    return jsonify({
-        'status': 'success',
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'count': len(breaking_articles),
-        'articles': breaking_articles
-    })
+    return jsonify(build_list_payload(breaking_articles))
 
 @app.route('/sources', methods=['GET'])
+@conditional_response
 def get_sources():
     """API endpoint to get information about sources"""
     logger.info("API request received for sources information")
     
-    with cache_lock:
-        stats = source_stats.copy()
+    stats = get_shared_state()['source_stats']
     
     return jsonify({
         'status': 'success',
@@ -774,25 +1854,61 @@ def get_health():
     """API endpoint to get system health status"""
     logger.info("API request received for health status")
     
+    state = get_shared_state()
     with cache_lock:
-        status = {
-            'status': 'healthy' if health_status["last_successful_update"] else 'initializing',
-            'last_update': health_status["last_successful_update"],
-            'cache_size': len(feed_cache),
-            'uptime': str(datetime.now() - app.start_time),
-            'failed_sources': health_status["failed_sources"],
-            'duplicate_count': duplicate_count
+        conditional_get = {
+            'hits': conditional_get_stats['hits'],
+            'misses': conditional_get_stats['misses'],
+            'hit_rate': round(conditional_get_stats['hits'] / max(1, conditional_get_stats['hits'] + conditional_get_stats['misses']), 3)
         }
     
+    status = {
+        'status': 'healthy' if state['health_status']["last_successful_update"] else 'initializing',
+        'role': get_process_role(),
+        'snapshot_generation': state['generation'],
+        'last_update': state['health_status']["last_successful_update"],
+        'cache_size': state['cache_size'],
+        'uptime': str(datetime.now() - app.start_time),
+        'warm_start': warm_start_source,
+        'failed_sources': state['health_status']["failed_sources"],
+        'source_latency': state['source_latency'],
+        'conditional_get': conditional_get,
+        'feeds': {'registered': len(feed_registry), 'enabled': len(RSS_FEEDS), 'polled_here': len(owned_feeds),
+                  'shard': FETCH_SHARD, 'shards': FETCH_SHARDS, 'builds_snapshots': SNAPSHOT_BUILDER},
+        'poll_schedule': poll_scheduler.stats(),
+        'parser': {'counts': dict(parser_stats), 'parse_time': dict(source_parse_time)},
+        'analysis_cache': analysis_cache.stats(),
+        'sentiment_pool': sentiment_pool.stats() if sentiment_pool else None,
+        'near_duplicates': near_duplicate_index.stats(),
+        'duplicate_count': state['duplicate_count']
+    }
+    
     return jsonify(status)
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Metrics in the Prometheus text format, or with format=json the refresh pipeline stage report"""
+    if request.args.get('format', 'prometheus').lower() != 'json':
+        return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
+    cycles = pipeline_metrics.cycles()
+    limit = max(0, request.args.get('cycles', 10, type=int))
+    
+    return jsonify({
+        'status': 'success',
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'role': get_process_role(),
+        'stages': pipeline_metrics.summary(),
+        'cycles': cycles[-limit:] if limit else []
+    })
+
 @app.route('/api', methods=['GET'])
 def api_docs():
     """API documentation endpoint"""
     return jsonify({
         'service': 'Entertainment RSS Feed Aggregator API',
         'version': '2.0',
-        'updated_every': '15 seconds',
+        'updated_every': f"{POLL_MIN_INTERVAL:g} to {POLL_MAX_INTERVAL:g} seconds per source, depending on how often it publishes",
         'endpoints': {
             '/rss': {
                 'description': 'Get the latest entertainment news with filtering options',
@@ -804,15 +1920,51 @@ def api_docs():
                     'q': 'Search in title and summary',
                     'sort': 'Sort by date or trending',
                     'page': 'Page number for pagination',
-                    'size': 'Number of results per page (max 100)'
+                    'size': 'Number of results per page (max 100)',
+                    'since': 'Only articles published at or after this time (YYYY-MM-DD[ HH:MM:SS] or Unix timestamp), searched in the full history',
+                    'until': 'Only articles published at or before this time, searched in the full history',
+                    'cursor': 'next_cursor of the previous history page'
+                }
+            },
+            '/stream': {
+                'description': 'Server-Sent Events: a snapshot event, then a diff event (added articles, updated fields, removed ids) whenever the feed changes',
+                'parameters': {
+                    'source': 'Filter by news source',
+                    'category': 'Filter by category',
+                    'sentiment': 'Filter by sentiment (positive, negative, neutral)',
+                    'breaking': 'Only breaking news (true/false)',
+                    'q': 'Search in title and summary',
+                    'last_event_id': 'Resume after this event id (browsers send the Last-Event-ID header on reconnect)'
+                }
+            },
+            '/trending': {
+                'description': 'Get trending entertainment news, ranked by a score that halves every '
+                               f'{TRENDING_HALF_LIFE_HOURS:g} hours',
+                'parameters': {
+                    'k': f'Number of articles (default {TRENDING_DEFAULT_K}, max {TRENDING_MAX_K})',
+                    'window': 'Only articles published within this many hours'
+                }
+            },
+            '/stories': {
+                'description': 'Get related articles grouped into stories, ranked by how many outlets covered them in the last hour',
+                'parameters': {
+                    'min_sources': 'Only stories covered by at least this many outlets (default 2)',
+                    'limit': 'Maximum number of stories (default 20, max 100)'
                 }
             },
-            '/trending': 'Get trending entertainment news',
             '/categories': 'Get list of available categories',
             '/category/{name}': 'Get articles by category',
             '/breaking': 'Get breaking news only',
             '/sources': 'Get information about news sources',
-            '/health': 'Get system health status'
+            '/health': 'Get system health status',
+            '/metrics': {
+                'description': 'Prometheus metrics: fetch, parse, analysis, refresh cycle and request histograms, '
+                               'cache hit ratios and snapshot age',
+                'parameters': {
+                    'format': 'json for the duration, input size and output size of each refresh pipeline stage',
+                    'cycles': 'With format=json, number of recent refresh cycles to list (default 10)'
+                }
+            }
         }
     })
 
@@ -824,20 +1976,54 @@ def start_background_thread():
 
 def initialize_app():
     """Initialize the application"""
+    global leader_election, article_store, http_session, async_fetcher, sentiment_pool, local_snapshot
+    
     # Set start time for uptime tracking
     app.start_time = datetime.now()
     
+    # Decide whether this process fetches feeds or follows an elected fetcher
+    leader_election = create_leader_election()
+    
+    # Compile any user keyword sets before the first articles are analysed
+    refresh_keyword_matchers()
+    
+    # Read the feeds to aggregate, and which of them this process polls
+    refresh_feed_registry()
+    
+    # One long-lived client per process, so connections to publishers survive between cycles
+    http_session = get_session()
+    async_fetcher = create_async_fetcher()
+    
+    # Worker processes start on the first batch, so followers that never fetch don't spawn any
+    if SENTIMENT_WORKERS > 0:
+        sentiment_pool = SentimentPool(workers=SENTIMENT_WORKERS, fallback=calculate_sentiment)
+    
+    # Open the persistent article history
+    if ARTICLE_DB_PATH:
+        try:
+            article_store = ArticleStore(ARTICLE_DB_PATH, retention_days=ARTICLE_RETENTION_DAYS)
+        except Exception as e:
+            logger.error(f"Could not open article history at {ARTICLE_DB_PATH}: {str(e)}")
+    
     # Create the static directory if it doesn't exist
     os.makedirs('static', exist_ok=True)
     
     # Create the templates directory if it doesn't exist
     os.makedirs('templates', exist_ok=True)
     
-    # Start the feed updater in a background thread
-    start_background_thread()
+    # Serve an empty generation, or the last snapshot, until the first refresh completes
+    with cache_lock:
+        local_snapshot = LocalSnapshot(extras=build_snapshot_extras([], source_stats, None))
+    hydrate_caches()
+    
+    # Start the feed updater in a background thread, unless the caller drives refresh_feeds itself
+    if BACKGROUND_UPDATES:
+        start_background_thread()
 
-# Initialize the app when the module is loaded
-initialize_app()
+# Initialize the app when the module is loaded, but not when a spawned sentiment
+# worker re-imports it as __mp_main__ (which happens under `python app.py`)
+if __name__ != '__mp_main__':
+    initialize_app()
 
 if __name__ == '__main__':
     # Determine the port to use (for Render.com compatibility)
@@ -0,0 +1,332 @@
+"""Benchmark refresh cycles and API request load against the local feed server
+
+Run from the repository root:
+
+    python benchmarks/end_to_end.py [--cycles N] [--requests N] [--concurrency N] [--env NAME=VALUE]
+                                    [--output FILE] [--baseline FILE] [feed server options]
+
+Starts benchmarks/feed_server.py (see its --help for the latency, size, 304 and
+error options, accepted here too) and imports the app with
+BACKGROUND_UPDATES=false, its snapshot and history in a temporary directory,
+and a feed registry of the served fixtures. It runs one cold refresh_feeds()
+cycle and --cycles cycles after the feeds advance, then sends --requests
+requests to every --endpoint from --concurrency threads through the WSGI app,
+once idle and once while refresh cycles run, keeping the fastest of --repeat
+runs. Log records below WARNING are dropped, since writing them would dominate
+the request timings.
+
+Prints the results as JSON: cycle and stage times, throughput and p50/p99
+latency per endpoint, and peak memory. With --baseline, the headline metrics
+are compared with an earlier --output file; those more than --tolerance worse
+are listed under `regressions` and the exit status is 1.
+"""
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from feed_server import add_server_arguments, server_options  # noqa: E402
+
+DEFAULT_ENDPOINTS = ['/rss', '/rss?page=2&size=20', '/rss?category=Movies', '/trending', '/trending?k=10&window=6',
+                     '/category/Movies', '/category/Music']
+
+# Metrics compared with --baseline, and whether lower or higher is better
+COMPARED_METRICS = {
+    'cycles.cold_seconds': 'lower',
+    'cycles.steady.p50_seconds': 'lower',
+    'requests.*.p50_ms': 'lower',
+    'requests.*.p99_ms': 'lower',
+    'requests.*.throughput_rps': 'higher',
+    'memory.peak_rss_mb': 'lower',
+}
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(share * len(ordered) + 0.5) - 1))]
+
+
+def summarize_seconds(values):
+    return {
+        'count': len(values),
+        'mean_seconds': round(sum(values) / len(values), 6),
+        'p50_seconds': round(percentile(values, 0.5), 6),
+        'p99_seconds': round(percentile(values, 0.99), 6),
+        'max_seconds': round(max(values), 6),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def start_feed_server(options):
+    """Start the feed server in its own process, so it doesn't share the app's GIL"""
+    command = [sys.executable, os.path.join(BENCHMARKS_DIR, 'feed_server.py'), '--port', '0']
+    for name, value in options.items():
+        command += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise SystemExit(f"Feed server exited with status {process.returncode}")
+    return process, json.loads(line)
+
+
+def server_call(url, method='GET'):
+    with urllib.request.urlopen(urllib.request.Request(url, method=method), timeout=10) as response:
+        return json.loads(response.read())
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=BENCHMARKS_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_cycles(news_app, server_url, count):
+    """Run a cold cycle, then `count` cycles each after the feeds advance; return (seconds, stages) pairs"""
+    cycles = []
+    for number in range(count + 1):
+        if number:
+            server_call(f'{server_url}/_advance', method='POST')
+        started = time.perf_counter()
+        cycle = news_app.refresh_feeds(list(news_app.owned_feeds))
+        cycles.append((time.perf_counter() - started, cycle.stages))
+    return cycles
+
+
+def summarize_cycles(cycles, articles):
+    steady = cycles[1:]
+    stage_seconds = {}
+    for _, stages in steady:
+        for stage in stages:
+            stage_seconds.setdefault(stage['name'], []).append(stage['seconds'])
+    return {
+        'cold_seconds': round(cycles[0][0], 6),
+        'steady': summarize_seconds([seconds for seconds, _ in steady]) if steady else None,
+        'stages': {name: {'mean_seconds': round(sum(values) / len(values), 6),
+                          'p50_seconds': round(percentile(values, 0.5), 6)}
+                   for name, values in stage_seconds.items()},
+        'articles': articles,
+    }
+
+
+def run_load(flask_app, path, count, concurrency, warmup):
+    """Send `count` GET requests for `path` from `concurrency` threads, each with its own test client"""
+    latencies = []
+    failures = [0]
+    spans = []  # (first request started, last request finished) of every thread
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency)
+
+    def worker(requests):
+        client = flask_app.test_client()
+        for _ in range(warmup):
+            client.get(path).close()
+        timings, failed = [], 0
+        ready.wait()
+        first = time.perf_counter()
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(path)
+            response.get_data()
+            timings.append(time.perf_counter() - started)
+            failed += response.status_code != 200
+            response.close()
+        with lock:
+            latencies.extend(timings)
+            failures[0] += failed
+            spans.append((first, time.perf_counter()))
+
+    shares = [count // concurrency + (index < count % concurrency) for index in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(share,)) for share in shares]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(end for _, end in spans) - min(start for start, _ in spans)
+
+    return {
+        'requests': len(latencies),
+        'failed': failures[0],
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def best_load(flask_app, path, args):
+    """Run the load on `path` --repeat times and keep the run with the highest throughput"""
+    runs = [run_load(flask_app, path, args.requests, args.concurrency, args.warmup) for _ in range(args.repeat)]
+    return max(runs, key=lambda run: run['throughput_rps'])
+
+
+def run_load_during_refresh(news_app, server_url, endpoints, args):
+    """Run the request load while another thread keeps running refresh cycles"""
+    stop = threading.Event()
+    completed = [0]
+
+    def refresh():
+        while not stop.is_set():
+            server_call(f'{server_url}/_advance', method='POST')
+            news_app.refresh_feeds(list(news_app.owned_feeds))
+            completed[0] += 1
+
+    refresher = threading.Thread(target=refresh)
+    refresher.start()
+    try:
+        results = {path: best_load(news_app.app, path, args) for path in endpoints}
+    finally:
+        stop.set()
+        refresher.join()
+    return results, completed[0]
+
+
+def flatten(results, prefix=''):
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            yield from flatten(value, f'{name}.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def config_changes(results, baseline):
+    """Options that differ from the baseline run, whose numbers are then not like for like"""
+    before, after = baseline.get('config', {}), results['config']
+    return {name: [before.get(name), after.get(name)] for name in sorted(set(before) | set(after))
+            if name != 'tolerance' and before.get(name) != after.get(name)}
+
+
+def compare(results, baseline, tolerance):
+    """Return the compared metrics that are more than `tolerance` worse than in `baseline`"""
+    previous = dict(flatten(baseline))
+    regressions = []
+    for name, value in flatten({key: results[key] for key in ('cycles', 'requests', 'memory')}):
+        direction = next((d for pattern, d in COMPARED_METRICS.items() if fnmatch.fnmatchcase(name, pattern)), None)
+        before = previous.get(name)
+        if direction is None or not before:
+            continue
+        change = (value - before) / before
+        if (change > tolerance) if direction == 'lower' else (change < -tolerance):
+            regressions.append({'metric': name, 'baseline': before, 'current': value, 'change': round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=10, help='refresh cycles after the cold one')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per endpoint and phase')
+    parser.add_argument('--concurrency', type=int, default=4, help='threads sending requests')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per thread and endpoint')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each load, the fastest is kept')
+    parser.add_argument('--endpoint', action='append', dest='endpoints', help='path to load, repeatable')
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='app setting to use, repeatable, e.g. FETCH_ENGINE=async')
+    parser.add_argument('--no-history', action='store_true', help='run without the SQLite article history')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also report the peak Python heap of the cycles (slows them down)')
+    parser.add_argument('--output', help='also write the results to this file')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative change counted as a regression')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    endpoints = args.endpoints = args.endpoints or DEFAULT_ENDPOINTS
+
+    workdir = tempfile.mkdtemp(prefix='news-benchmark-')
+    os.environ.pop('REDIS_URL', None)
+    os.environ.pop('KEYWORDS_FILE', None)
+    os.environ.update({
+        'BACKGROUND_UPDATES': 'false',
+        'LEADER_ELECTION': 'none',
+        'SNAPSHOT_FILE': os.path.join(workdir, 'snapshot.bin'),
+        'ARTICLE_DB_PATH': '' if args.no_history else os.path.join(workdir, 'articles.db'),
+    })
+    os.environ.update(setting.split('=', 1) for setting in args.env)
+
+    server, served = start_feed_server(server_options(args))
+    try:
+        started = time.perf_counter()
+        import app as news_app
+        import_seconds = time.perf_counter() - started
+        logging.disable(logging.INFO)
+        rss_after_import = peak_rss_mb()
+
+        # Keep the real source names for the first feeds, so per-source settings like SOURCE_WEIGHTS apply
+        names = list(news_app.RSS_FEEDS)
+        news_app.FEED_REGISTRY = os.path.join(workdir, 'feeds.json')
+        with open(news_app.FEED_REGISTRY, 'w') as f:
+            json.dump({'feeds': [{'name': names[index] if index < len(names) else f'Benchmark Source {index + 1}', 'url': url}
+                                 for index, url in enumerate(served['feeds'])]}, f)
+        news_app.refresh_feed_registry()
+
+        if args.trace_memory:
+            tracemalloc.start()
+        cycles = run_cycles(news_app, served['url'], args.cycles)
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        tracemalloc.stop()
+        rss_after_cycles = peak_rss_mb()
+
+        idle = {path: best_load(news_app.app, path, args) for path in endpoints}
+        during_refresh, refreshes = run_load_during_refresh(news_app, served['url'], endpoints, args)
+
+        results = {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {name: value for name, value in vars(args).items() if name not in ('output', 'baseline')},
+            'import_seconds': round(import_seconds, 3),
+            'cycles': summarize_cycles(cycles, len(news_app.get_articles('feed'))),
+            'requests': {'idle': idle, 'during_refresh': during_refresh},
+            'refresh_cycles_during_load': refreshes,
+            'memory': {
+                'rss_after_import_mb': rss_after_import,
+                'peak_rss_cycles_mb': rss_after_cycles,
+                'peak_rss_mb': peak_rss_mb(),
+                'peak_traced_cycles_mb': round(traced_peak / 2 ** 20, 1) if traced_peak is not None else None,
+            },
+            'feed_server': server_call(f"{served['url']}/_stats"),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+    regressions = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        results['comparison'] = {'baseline': args.baseline, 'tolerance': args.tolerance,
+                                 'config_changes': config_changes(results, baseline), 'regressions': regressions}
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
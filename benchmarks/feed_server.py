@@ -0,0 +1,362 @@
+"""Serve the recorded feed fixtures over HTTP, so benchmarks never hit live publishers
+
+Run from the repository root:
+
+    python benchmarks/feed_server.py [--port N] [--sources N] [--items N] [--latency S] [--error-rate P] ...
+    python benchmarks/feed_server.py record URL [URL ...]
+
+Feed N is served at /feeds/N and replays fixture N (modulo the number of
+fixtures in benchmarks/fixtures) as an endless feed. Every POST to /_advance
+publishes --churn new entries on a --update-share of the feeds; the others keep
+answering conditional requests with 304 Not Modified. Feeds past the number of
+fixtures shuffle the words of titles and descriptions, so a thousand feeds are
+not a thousand copies of the same stories. Latency, body size and
+failed or truncated responses are injected with a seeded random generator, so
+two runs with the same options see the same responses. GET /_stats returns
+what was served. On startup one JSON line with the base URL and feed URLs is
+printed.
+
+`record` downloads live feeds into benchmarks/fixtures to refresh the fixtures.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+ENTRY_PATTERN = re.compile(rb'<(item|entry)[\s>].*?</\1>', re.S)
+TITLE_PATTERN = re.compile(rb'(<title[^>]*>)(.*?)(</title>)', re.S)
+LINK_PATTERN = re.compile(rb'(<link>)(.*?)(</link>)|(<link\b[^>]*?href=")([^"]*)(")', re.S)
+ID_PATTERN = re.compile(rb'(<(?:guid|id)\b[^>]*>)(.*?)(</(?:guid|id)>)', re.S)
+RSS_DATE_PATTERN = re.compile(rb'<pubDate>.*?</pubDate>', re.S)
+ATOM_DATE_PATTERN = re.compile(rb'<(published|updated)>.*?</\1>', re.S)
+TEXT_PATTERN = re.compile(rb'(<(title|description|summary)\b[^>]*>)(.*?)(</\2>)', re.S)
+
+# Seconds between the entries of a feed's first version, and between the entries of one advance
+ENTRY_SPACING = 900
+CHURN_SPACING = 60
+
+
+class Fixture:
+    """A recorded feed split into the document around its entries and the entries themselves"""
+
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            body = f.read()
+        matches = list(ENTRY_PATTERN.finditer(body))
+        if not matches:
+            raise ValueError(f"{path} has no <item> or <entry> elements")
+        self.head = body[:matches[0].start()]
+        self.tail = body[matches[-1].end():]
+        self.entries = [match.group(0) for match in matches]
+        self.atom = matches[0].group(1) == b'entry'
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    return [Fixture(path) for path in sorted(glob.glob(os.path.join(directory, '*.xml')))]
+
+
+def stamp_entry(entry, feed, index, lap, published, atom):
+    """Make a fixture entry unique to feed `feed` and its `index`-th entry, published at `published`
+
+    Entries past the end of the fixture reuse it with `(lap)` appended to the
+    title, so every title and link stays distinct.
+    """
+    marker = f'{feed}-{index}'.encode()
+    if lap > 1:
+        entry = TITLE_PATTERN.sub(lambda m: m.group(1) + m.group(2) + f' ({lap})'.encode() + m.group(3), entry, count=1)
+
+    def link(match):
+        if match.group(1):
+            start, url, end = match.group(1, 2, 3)
+        else:
+            start, url, end = match.group(4, 5, 6)
+        separator = b'&amp;' if b'?' in url else b'?'
+        return start + url + separator + b'ref=' + marker + end
+
+    entry = LINK_PATTERN.sub(link, entry, count=1)
+    entry = ID_PATTERN.sub(lambda m: m.group(1) + m.group(2) + b'-' + marker + m.group(3), entry, count=1)
+    if atom:
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(published)).encode()
+        return ATOM_DATE_PATTERN.sub(lambda m: b'<' + m.group(1) + b'>' + stamp + b'</' + m.group(1) + b'>', entry)
+    return RSS_DATE_PATTERN.sub(b'<pubDate>' + formatdate(published, usegmt=True).encode() + b'</pubDate>', entry, count=1)
+
+
+def shuffle_text(entry, rng):
+    """Shuffle the words of an entry's title and description, so it is no near-duplicate of the original"""
+    def shuffle(match):
+        start, text, end = match.group(1), match.group(3), match.group(4)
+        prefix = suffix = b''
+        if text.startswith(b'<![CDATA[') and text.endswith(b']]>'):
+            prefix, text, suffix = b'<![CDATA[', text[9:-3], b']]>'
+        words = text.split()
+        rng.shuffle(words)
+        return start + prefix + b' '.join(words) + suffix + end
+
+    return TEXT_PATTERN.sub(shuffle, entry)
+
+
+class FeedState:
+    """An endless feed replaying one fixture, advanced `churn` entries at a time"""
+
+    def __init__(self, index, fixture, items, churn, started, distinct=False):
+        self.index = index
+        self.fixture = fixture
+        self.distinct = distinct  # Shuffle the text of entries, for feeds replaying a fixture another feed replays
+        self.items = items
+        self.churn = churn
+        self.version = 0
+        self.published = [started]  # When each version was published
+        self.requests = 0
+        self._rendered = {}
+
+    def entry_time(self, position):
+        """Publication time of the `position`-th entry of the feed, counting from its first"""
+        if position < self.items:
+            return self.published[0] - (self.items - 1 - position) * ENTRY_SPACING
+        version = -(-(position - self.items + 1) // self.churn)
+        newest = self.items - 1 + version * self.churn
+        return self.published[version] - (newest - position) * CHURN_SPACING
+
+    def render(self, padding):
+        """Return the body of the current version, newest entry first"""
+        body = self._rendered.get(self.version)
+        if body is None:
+            entries = self.fixture.entries
+            newest = self.items - 1 + self.version * self.churn
+            # Feeds sharing a fixture start at different entries, so they rarely list the same story at once
+            offset = self.index * 7
+            parts = [self.fixture.head]
+            for position in range(newest, newest - self.items, -1):
+                slot = position + offset
+                entry = entries[slot % len(entries)]
+                if self.distinct:
+                    entry = shuffle_text(entry, random.Random(f'{self.index}:{position}'))
+                entry = stamp_entry(entry, self.index, position, slot // len(entries) + 1, self.entry_time(position),
+                                    self.fixture.atom)
+                if padding > len(entry):
+                    entry += b'<!--' + b'x' * (padding - len(entry) - 7) + b'-->'
+                parts.append(entry + b'\n')
+            parts.append(self.fixture.tail)
+            body = b''.join(parts)
+            self._rendered = {self.version: body}
+        return body
+
+    def advance(self, now):
+        self.version += 1
+        self.published.append(now)
+
+    @property
+    def etag(self):
+        return f'"feed-{self.index}-{self.version}"'
+
+    @property
+    def last_modified(self):
+        return formatdate(self.published[self.version], usegmt=True)
+
+
+class FeedServer(ThreadingHTTPServer):
+    """HTTP server of `sources` endless feeds with injected latency and failures"""
+
+    daemon_threads = True
+
+    def __init__(self, address, sources=11, items=30, churn=3, update_share=0.5, latency=0.0, jitter=0.0,
+                 validators='both', error_rate=0.0, error_status=503, malformed_rate=0.0, padding=0, seed=1,
+                 fixtures=None):
+        super().__init__(address, FeedRequestHandler)
+        fixtures = fixtures or load_fixtures()
+        if not fixtures:
+            raise ValueError(f"No fixtures found in {FIXTURES_DIR}")
+        started = time.time()
+        self.feeds = [FeedState(index, fixtures[index % len(fixtures)], items, churn, started, index >= len(fixtures))
+                      for index in range(sources)]
+        self.update_share = update_share
+        self.latency = latency
+        self.jitter = jitter
+        self.validators = validators
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.malformed_rate = malformed_rate
+        self.padding = padding
+        self.seed = seed
+        self.advances = 0
+        self.stats = {'requests': 0, 'ok': 0, 'not_modified': 0, 'errors': 0, 'malformed': 0, 'bytes': 0}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def feed_urls(self):
+        return [f'{self.base_url}/feeds/{feed.index}' for feed in self.feeds]
+
+    def advance(self):
+        """Publish new entries on a seeded share of the feeds, returning their indexes"""
+        with self.lock:
+            self.advances += 1
+            rng = random.Random(f'{self.seed}:advance:{self.advances}')
+            now = time.time()
+            advanced = [feed.index for feed in self.feeds if rng.random() < self.update_share]
+            for index in advanced:
+                self.feeds[index].advance(now)
+            return advanced
+
+    def respond(self, feed, headers):
+        """Decide a feed request: (delay, status, response headers, body)"""
+        with self.lock:
+            feed.requests += 1
+            rng = random.Random(f'{self.seed}:{feed.index}:{feed.requests}')
+            delay = self.latency + rng.random() * self.jitter
+            self.stats['requests'] += 1
+
+            if rng.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return delay, self.error_status, {}, b'Service Unavailable\n'
+
+            validators = {}
+            if self.validators in ('both', 'etag'):
+                validators['ETag'] = feed.etag
+            if self.validators in ('both', 'last-modified'):
+                validators['Last-Modified'] = feed.last_modified
+            if validators and self.not_modified(feed, headers):
+                self.stats['not_modified'] += 1
+                return delay, 304, validators, b''
+
+            body = feed.render(self.padding)
+            if rng.random() < self.malformed_rate:
+                # Cut the document off part-way, like a connection dropped by the publisher
+                self.stats['malformed'] += 1
+                body = body[:len(body) // 3]
+            self.stats['ok'] += 1
+            self.stats['bytes'] += len(body)
+            content_type = 'application/atom+xml' if feed.fixture.atom else 'application/rss+xml'
+            return delay, 200, dict(validators, **{'Content-Type': f'{content_type}; charset=utf-8'}), body
+
+    def not_modified(self, feed, headers):
+        if self.validators in ('both', 'etag') and headers.get('If-None-Match'):
+            return headers['If-None-Match'] == feed.etag
+        if self.validators in ('both', 'last-modified') and headers.get('If-Modified-Since'):
+            try:
+                return parsedate_to_datetime(headers['If-Modified-Since']).timestamp() >= int(feed.published[feed.version])
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def snapshot_stats(self):
+        with self.lock:
+            return dict(self.stats, advances=self.advances, versions=[feed.version for feed in self.feeds])
+
+
+class FeedRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the publishers' CDNs
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/_stats':
+            return self.send_json(self.server.snapshot_stats())
+        if path == '/feeds':
+            return self.send_json(self.server.feed_urls())
+
+        match = re.fullmatch(r'/feeds/(\d+)', path)
+        if not match or int(match.group(1)) >= len(self.server.feeds):
+            return self.send_body(404, {}, b'Not Found\n')
+
+        delay, status, headers, body = self.server.respond(self.server.feeds[int(match.group(1))], self.headers)
+        if delay:
+            time.sleep(delay)
+        self.send_body(status, headers, body)
+
+    def do_POST(self):
+        if self.path == '/_advance':
+            return self.send_json({'advanced': self.server.advance()})
+        self.send_body(404, {}, b'Not Found\n')
+
+    def send_json(self, data):
+        self.send_body(200, {'Content-Type': 'application/json'}, json.dumps(data).encode())
+
+    def send_body(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def record(urls, directory=FIXTURES_DIR):
+    """Save the current documents of live feeds as fixtures named after their host and path"""
+    for url in urls:
+        parsed = urlparse(url)
+        name = re.sub(r'[^a-z0-9]+', '-', f'{parsed.netloc}{parsed.path}'.lower()).strip('-')
+        request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0 (compatible; feed-fixture-recorder)'})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            body = response.read()
+        path = os.path.join(directory, f'{name}.xml')
+        with open(path, 'wb') as f:
+            f.write(body)
+        print(f'{url} -> {path} ({len(body)} bytes, {len(ENTRY_PATTERN.findall(body))} entries)')
+
+
+def add_server_arguments(parser):
+    """Options shaping the served feeds, shared with the benchmarks that start this server"""
+    parser.add_argument('--sources', type=int, default=11, help='number of feeds served')
+    parser.add_argument('--items', type=int, default=30, help='entries per feed document')
+    parser.add_argument('--churn', type=int, default=3, help='new entries per feed on every advance')
+    parser.add_argument('--update-share', type=float, default=0.5, help='share of the feeds that advance')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra seconds of latency')
+    parser.add_argument('--validators', choices=('both', 'etag', 'last-modified', 'none'), default='both',
+                        help='validators sent, and honoured with 304 responses')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests failed with --error-status')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='share of documents cut off part-way')
+    parser.add_argument('--padding', type=int, default=0, help='pad every entry to at least this many bytes')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def server_options(args):
+    return {name: getattr(args, name) for name in (
+        'sources', 'items', 'churn', 'update_share', 'latency', 'jitter', 'validators', 'error_rate',
+        'error_status', 'malformed_rate', 'padding', 'seed')}
+
+
+def main():
+    if sys.argv[1:2] == ['record']:
+        parser = argparse.ArgumentParser(description='Save live feeds as benchmark fixtures')
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--directory', default=FIXTURES_DIR)
+        args = parser.parse_args(sys.argv[2:])
+        return record(args.urls, args.directory)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='0 picks a free port')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = FeedServer((args.host, args.port), **server_options(args))
+    print(json.dumps({'url': server.base_url, 'feeds': server.feed_urls()}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Compare the compiled keyword matcher with the substring scans it replaced
+
+Run from the repository root:
+
+    python benchmarks/keyword_matching.py [--articles N] [--repeat N] [--extra-keywords N]
+
+Prints the timings and the number of articles whose categories or breaking flag
+differ between the two implementations as JSON. The `categories_large` case adds
+--extra-keywords generated keywords to the category table, the way user keyword
+files grow it.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.keyword_matcher import KeywordMatcher  # noqa: E402
+
+# Same tables as app.py, kept here so importing app (and starting its threads) isn't needed
+CATEGORIES = {
+    "Movies": ["movie", "film", "cinema", "box office", "hollywood", "director", "actor", "actress", "oscars", "academy awards"],
+    "TV": ["tv", "television", "show", "series", "episode", "streaming", "netflix", "hulu", "disney+", "hbo", "amazon prime"],
+    "Music": ["music", "song", "album", "artist", "concert", "tour", "singer", "band", "grammy", "billboard"],
+    "Celebrity": ["celebrity", "star", "famous", "gossip", "divorce", "wedding", "relationship", "red carpet"],
+    "Gaming": ["game", "gaming", "playstation", "xbox", "nintendo", "console", "pc gaming", "esports"],
+    "Tech": ["tech", "technology", "gadget", "apple", "iphone", "android", "samsung", "device"]
+}
+
+BREAKING_KEYWORDS = [
+    "breaking", "urgent", "just in", "alert", "developing story", "breaking news",
+    "exclusive", "update", "emergency", "crisis", "just announced", "happening now"
+]
+
+FILLER = ("the a of to in and with for on at by from after before says reports new first week year "
+          "fans start starting showcase starring tvOS bandwidth husband tourism updated gameplay "
+          "technique appliance latest season premiere review trailer interview").split()
+
+
+def substring_categories(text, table=CATEGORIES):
+    text = text.lower()
+    categories = []
+    for category, keywords in table.items():
+        for keyword in keywords:
+            if keyword.lower() in text:
+                categories.append(category)
+                break
+    return categories or ["General"]
+
+
+def substring_breaking(text):
+    text = text.lower()
+    for keyword in BREAKING_KEYWORDS:
+        if keyword.lower() in text:
+            return True
+    return False
+
+
+def make_articles(count, seed=1):
+    """Build title + summary texts shaped like the analysed feed entries"""
+    rng = random.Random(seed)
+    keywords = [keyword for words in CATEGORIES.values() for keyword in words] + BREAKING_KEYWORDS
+    articles = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(30, 45))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        articles.append(' '.join(words).capitalize() + '.')
+    return articles
+
+
+def make_keyword_table(count, seed=2):
+    """Return CATEGORIES plus `count` random keywords spread over extra categories"""
+    rng = random.Random(seed)
+    table = dict(CATEGORIES)
+    for index in range(count):
+        keyword = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 10)))
+        table.setdefault(f'Extra {index // 50}', []).append(keyword)
+    return table
+
+
+def best_of(repeat, function, articles):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in articles:
+            function(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--extra-keywords', type=int, default=600)
+    args = parser.parse_args()
+
+    articles = make_articles(args.articles)
+
+    start = time.perf_counter()
+    category_matcher = KeywordMatcher(CATEGORIES)
+    breaking_matcher = KeywordMatcher.from_keywords(BREAKING_KEYWORDS)
+    compile_time = time.perf_counter() - start
+
+    large_table = make_keyword_table(args.extra_keywords)
+    large_matcher = KeywordMatcher(large_table)
+
+    def compiled_categories(text):
+        return category_matcher.match(text) or ["General"]
+
+    def substring_large(text):
+        return substring_categories(text, large_table)
+
+    def compiled_large(text):
+        return large_matcher.match(text) or ["General"]
+
+    results = {
+        'articles': len(articles),
+        'compile_ms': round(compile_time * 1000, 3),
+    }
+    for name, old, new in (('categories', substring_categories, compiled_categories),
+                           ('breaking', substring_breaking, breaking_matcher.search),
+                           ('categories_large', substring_large, compiled_large)):
+        old_time = best_of(args.repeat, old, articles)
+        new_time = best_of(args.repeat, new, articles)
+        results[name] = {
+            'substring_us_per_article': round(old_time / len(articles) * 1e6, 2),
+            'compiled_us_per_article': round(new_time / len(articles) * 1e6, 2),
+            'speedup': round(old_time / new_time, 2),
+            'articles_changed': sum(old(text) != new(text) for text in articles),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
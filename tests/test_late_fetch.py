@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+
+os.environ.update({
+    'BACKGROUND_UPDATES': 'false',
+    'LEADER_ELECTION': 'none',
+    'SENTIMENT_WORKERS': '0',
+    'ARTICLE_DB_PATH': '',
+    'SNAPSHOT_FILE': os.path.join(tempfile.mkdtemp(prefix='news-test-'), 'snapshot.bin'),
+})
+os.environ.pop('REDIS_URL', None)
+os.environ.pop('FEED_REGISTRY', None)
+
+import app  # noqa: E402
+from utils.article import Article  # noqa: E402
+
+FEED = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>{source}</title>
+<item><title>{first}</title><link>https://example.com/{source}/1</link>
+<description>{first}.</description><pubDate>Mon, 12 Oct 2026 10:00:00 GMT</pubDate></item>
+<item><title>{second}</title><link>https://example.com/{source}/2</link>
+<description>{second}.</description><pubDate>Mon, 12 Oct 2026 11:00:00 GMT</pubDate></item>
+</channel></rss>"""
+
+HEADLINES = {
+    'fast': ('Dune Part Three starts shooting in Jordan', 'Taylor Swift adds stadium dates in Tokyo'),
+    'slow': ('Succession cast reunites for charity gala', 'Nintendo reveals new Zelda remake trailer'),
+}
+
+
+def fetch_after(delays):
+    def fetch(source_name, feed_url, session):
+        time.sleep(delays[source_name])
+        first, second = HEADLINES[source_name]
+        body = FEED.format(source=source_name, first=first, second=second).encode('utf-8')
+        return app.parse_feed_response(source_name, 200, {}, [body])
+    return fetch
+
+
+def slow_scores(texts):
+    time.sleep(0.3)
+    return [0.5 for _ in texts]
+
+
+def test_a_fetch_finishing_after_the_deadline_is_stored_as_scored_records(monkeypatch):
+    monkeypatch.setattr(app, 'RSS_FEEDS', {'fast': 'https://fast.example.com/rss', 'slow': 'https://slow.example.com/rss'})
+    monkeypatch.setattr(app, 'FETCH_DEADLINE', 0.2)
+    monkeypatch.setattr(app, 'fetch_rss_feed', fetch_after({'fast': 0.0, 'slow': 0.35}))
+    monkeypatch.setattr(app, 'score_sentiments', slow_scores)
+
+    # The slow fetch misses the deadline and finishes while the fast one's sentiment is being scored
+    app.refresh_feeds(['fast', 'slow'])
+    app.in_flight_fetches['slow'].result(timeout=5)
+    assert all(isinstance(article, Article) for articles in app.source_articles.values() for article in articles)
+
+    # The next cycle builds with the late articles, scored, instead of failing on them
+    monkeypatch.setattr(app, 'fetch_rss_feed', fetch_after({'fast': 0.0, 'slow': 0.0}))
+    app.refresh_feeds(['fast', 'slow'])
+
+    slow = [article for article in app.get_articles('feed') if article['source'] == 'slow']
+    assert len(slow) == 2
+    assert all(article['sentiment_score'] == 0.5 for article in slow)
+    assert not app.pending_sentiment
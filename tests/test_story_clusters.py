@@ -0,0 +1,48 @@
+from utils.story_clusters import StoryClusterer
+
+NOW = 1_750_000_000
+
+
+def article(article_id, title, source='Variety', minutes_ago=0):
+    return {'id': article_id, 'title': title, 'summary': '', 'source': source, 'published_ts': NOW - 60 * minutes_ago}
+
+
+def test_unrelated_headlines_sharing_an_entity_stay_apart():
+    clusterer = StoryClusterer()
+    story_of = clusterer.update([
+        article('a', "Netflix renews 'Stranger Things' for a fifth and final season", minutes_ago=30),
+        article('b', "Netflix cancels 'Lockwood & Co.' after one season", minutes_ago=20),
+        article('c', "'Wednesday' season two premiere date set by Netflix", minutes_ago=10),
+        article('d', "Shonda Rhimes lands new series order at Netflix"),
+    ], now=NOW)
+
+    assert len(set(story_of.values())) == 4
+
+
+def test_coverage_of_one_story_is_grouped():
+    clusterer = StoryClusterer()
+    story_of = clusterer.update([
+        article('a', "Netflix renews 'Stranger Things' for a fifth and final season", minutes_ago=30),
+        article('b', "'Stranger Things' renewed for fifth and final season at Netflix", source='Deadline', minutes_ago=20),
+        article('c', "Shonda Rhimes lands new series order at Netflix", source='Deadline'),
+    ], now=NOW)
+
+    assert story_of['a'] == story_of['b']
+    assert story_of['c'] != story_of['a']
+
+
+def test_a_large_story_does_not_absorb_unrelated_articles():
+    clusterer = StoryClusterer()
+    clusterer.update([
+        article(f'st-{number}', f"Netflix renews 'Stranger Things' for a final season, {detail}", source=f'Outlet {number}',
+                minutes_ago=60 - number)
+        for number, detail in enumerate(['Duffer Brothers confirm', 'Millie Bobby Brown returns', 'Winona Ryder to star',
+                                         'David Harbour teases ending', 'production starts in Atlanta',
+                                         'Emmy campaign planned'])
+    ], now=NOW)
+
+    story_of = clusterer.update([
+        article('lockwood', "Netflix cancels 'Lockwood & Co.' after one season in Atlanta"),
+    ], now=NOW)
+
+    assert story_of['lockwood'] not in {clusterer._cluster_of[f'st-{number}'] for number in range(6)}
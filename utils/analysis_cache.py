@@ -0,0 +1,58 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_fingerprint(*parts):
+    """Fingerprint the raw entry content that the analysis fields are derived from"""
+    content = "\x1f".join(part or "" for part in parts).encode('utf-8')
+    return hashlib.md5(content).hexdigest()
+
+
+class AnalysisCache:
+    """Bounded LRU cache of per-article analysis results
+
+    Entries are keyed by article id and carry the fingerprint of the content they
+    were computed from, so an edited entry is re-analysed instead of served stale.
+    """
+
+    def __init__(self, max_size=5000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, article_id, fingerprint):
+        """Return the cached fields for an article, or None if missing or stale"""
+        with self._lock:
+            entry = self._entries.get(article_id)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(article_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, article_id, fingerprint, fields):
+        """Store analysis fields for an article, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[article_id] = (fingerprint, fields)
+            self._entries.move_to_end(article_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Return size and hit/eviction counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions
+            }
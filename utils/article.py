@@ -0,0 +1,163 @@
+import hashlib
+import time
+from collections.abc import Mapping
+
+from utils.trending import article_timestamp
+
+
+def generate_article_hash(title, link):
+    """Generate a unique hash for article deduplication"""
+    content = (title + link).encode('utf-8')
+    return hashlib.md5(content).hexdigest()
+
+
+class Article(Mapping):
+    """Immutable, normalized article record shared by every snapshot that contains it
+
+    Built once when an entry is ingested, with every field the API returns, so
+    request handlers neither fill in defaults nor copy it. It reads like the
+    article dict it replaces (`article['title']`, `article.get('story_id')`,
+    `dict(article)`), but cannot be modified: pipeline stages that change a
+    field get a new record from `replace`. `trending_score` is only present on
+    records ranked by the trending ranker.
+    """
+
+    __slots__ = ('id', 'title', 'link', 'source', 'published_date', 'published_ts', 'summary', 'sentiment',
+                 'sentiment_score', 'categories', 'breaking_news', 'image_url', 'popularity', 'also_reported_by',
+                 'story_id', 'trending_score')
+
+    def __init__(self, id, title, link, source, published_date, published_ts=None, summary='', sentiment='neutral',
+                 sentiment_score=None, categories=('General',), breaking_news=False, image_url=None, popularity=0,
+                 also_reported_by=(), story_id=None, trending_score=None):
+        set_field = object.__setattr__
+        set_field(self, 'id', id)
+        set_field(self, 'title', title)
+        set_field(self, 'link', link)
+        set_field(self, 'source', source)
+        set_field(self, 'published_date', published_date)
+        set_field(self, 'published_ts', published_ts)
+        set_field(self, 'summary', summary)
+        set_field(self, 'sentiment', sentiment)
+        set_field(self, 'sentiment_score', sentiment_score)
+        set_field(self, 'categories', tuple(categories))
+        set_field(self, 'breaking_news', breaking_news)
+        set_field(self, 'image_url', image_url)
+        set_field(self, 'popularity', popularity)
+        set_field(self, 'also_reported_by', tuple(also_reported_by))
+        set_field(self, 'story_id', story_id)
+        set_field(self, 'trending_score', trending_score)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Normalize an article dict (a parsed entry, or one read back from a snapshot or store)"""
+        title = data.get('title') or ''
+        link = data.get('link') or '#'
+        categories = data.get('categories') or ['General']
+        if isinstance(categories, str):
+            categories = [categories]
+        published_date = data.get('published_date') or time.strftime('%Y-%m-%d %H:%M:%S')
+        published_ts = data.get('published_ts')
+        if published_ts is None:
+            published_ts = article_timestamp({'published_date': published_date})
+        return cls(
+            id=data.get('id') or generate_article_hash(title, data.get('link') or ''),
+            title=title,
+            link=link,
+            source=data.get('source') or '',
+            published_date=published_date,
+            published_ts=published_ts,
+            summary=data.get('summary') or '',
+            sentiment=data.get('sentiment') or 'neutral',
+            sentiment_score=data.get('sentiment_score'),
+            categories=categories,
+            breaking_news=bool(data.get('breaking_news', False)),
+            image_url=data.get('image_url'),
+            popularity=data.get('popularity', 0),
+            also_reported_by=data.get('also_reported_by') or (),
+            story_id=data.get('story_id'),
+            trending_score=data.get('trending_score')
+        )
+
+    def replace(self, **changes):
+        """Return a copy of this record with `changes` applied"""
+        fields = {field: getattr(self, field) for field in self.__slots__}
+        fields.update(changes)
+        return Article(**fields)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self}
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Article records are immutable, use replace() to change '{name}'")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Article records are immutable, cannot delete '{name}'")
+
+    def __getitem__(self, key):
+        if key not in FIELDS or (key == 'trending_score' and self.trending_score is None):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        # Mapping.get goes through __getitem__ and an exception for missing keys; this is read for every article
+        if key in FIELDS:
+            value = getattr(self, key)
+            if value is not None or key != 'trending_score':
+                return value
+        return default
+
+    def __iter__(self):
+        for field in self.__slots__:
+            if field != 'trending_score' or self.trending_score is not None:
+                yield field
+
+    def __len__(self):
+        return len(self.__slots__) - (self.trending_score is None)
+
+    def __eq__(self, other):
+        if isinstance(other, Article):
+            return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Article(id={self.id!r}, source={self.source!r}, title={self.title!r})"
+
+
+FIELDS = frozenset(Article.__slots__)
+
+
+class RecordCache:
+    """Values computed from article records, kept while the same records keep coming back
+
+    Records are immutable and a changed article is a new record, so a value
+    looked up by the record's identity is never stale. A stage that caches what
+    it computes per article only does that work for new or changed articles.
+    Call `rotate` once per cycle: entries not used since the previous rotation
+    are dropped.
+    """
+
+    def __init__(self):
+        self._current = {}
+        self._previous = {}
+
+    def get(self, article):
+        """Return the value stored for this very record, or None"""
+        key = id(article)
+        entry = self._current.get(key) or self._previous.get(key)
+        if entry is None or entry[0] is not article:
+            return None
+        self._current[key] = entry
+        return entry[1]
+
+    def put(self, article, value):
+        # Holding the record keeps its id from being reused by another object while the entry lives
+        self._current[id(article)] = (article, value)
+        return value
+
+    def rotate(self):
+        self._previous, self._current = self._current, {}
+
+    def __len__(self):
+        return len(self._current)
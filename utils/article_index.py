@@ -0,0 +1,128 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric terms"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class ArticleIndex:
+    """Posting lists over one immutable, ordered list of articles
+
+    Postings hold positions in that list, so intersecting them and sorting the
+    result yields matches in the original order.
+    """
+
+    def __init__(self, size, sources, categories, sentiments, breaking, terms):
+        self.size = size
+        self.sources = sources
+        self.categories = categories
+        self.sentiments = sentiments
+        self.breaking = breaking
+        self.terms = terms
+        self._vocabulary = sorted(terms)
+
+    @classmethod
+    def build(cls, articles, term_cache=None):
+        """Index the source, categories, sentiment, breaking flag and text of each article
+
+        `term_cache` is an optional RecordCache of each record's distinct terms,
+        so only new or changed records are tokenized.
+        """
+        sources = defaultdict(set)
+        categories = defaultdict(set)
+        sentiments = defaultdict(set)
+        breaking = set()
+        terms = defaultdict(set)
+
+        for position, article in enumerate(articles):
+            sources[article.get('source', '')].add(position)
+            for category in article.get('categories', []):
+                categories[category].add(position)
+            sentiments[article.get('sentiment')].add(position)
+            if article.get('breaking_news', False):
+                breaking.add(position)
+            article_terms = term_cache.get(article) if term_cache is not None else None
+            if article_terms is None:
+                article_terms = set(tokenize(article.get('title', '') + " " + article.get('summary', '')))
+                if term_cache is not None:
+                    term_cache.put(article, article_terms)
+            for term in article_terms:
+                terms[term].add(position)
+
+        return cls(len(articles), dict(sources), dict(categories), dict(sentiments), breaking, dict(terms))
+
+    def to_dict(self):
+        """Serialize the postings for a published snapshot"""
+        return {
+            'size': self.size,
+            'sources': {key: sorted(value) for key, value in self.sources.items()},
+            'categories': {key: sorted(value) for key, value in self.categories.items()},
+            'sentiments': {key: sorted(value) for key, value in self.sentiments.items()},
+            'breaking': sorted(self.breaking),
+            'terms': {key: sorted(value) for key, value in self.terms.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['size'],
+            {key: set(value) for key, value in data['sources'].items()},
+            {key: set(value) for key, value in data['categories'].items()},
+            {key: set(value) for key, value in data['sentiments'].items()},
+            set(data['breaking']),
+            {key: set(value) for key, value in data['terms'].items()}
+        )
+
+    def _prefix_postings(self, token):
+        """Union of the postings of every indexed term starting with `token`"""
+        postings = set()
+        start = bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            postings |= self.terms[term]
+        return postings
+
+    def search(self, source=None, category=None, sentiment=None, breaking_only=False, query=None):
+        """Return the sorted positions of articles matching every given filter
+
+        `source` matches any source name containing it, case-insensitively. Each
+        term of `query` must start a word of the title or summary; callers should
+        still check the full query against the candidates if they need phrase
+        matching.
+        """
+        postings = []
+
+        if source:
+            source = source.lower()
+            postings.append(set().union(*(positions for name, positions in self.sources.items() if source in name.lower())))
+
+        if category:
+            postings.append(self.categories.get(category, set()))
+
+        if sentiment:
+            postings.append(self.sentiments.get(sentiment, set()))
+
+        if breaking_only:
+            postings.append(self.breaking)
+
+        if query:
+            for token in set(tokenize(query)):
+                postings.append(self._prefix_postings(token))
+
+        if not postings:
+            return list(range(self.size))
+
+        # Intersect starting from the most selective posting list
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for positions in postings[1:]:
+            matches &= positions
+            if not matches:
+                break
+        return sorted(matches)
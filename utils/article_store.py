@@ -0,0 +1,187 @@
+import json
+import base64
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    published_date TEXT NOT NULL,
+    sentiment TEXT,
+    breaking_news INTEGER NOT NULL DEFAULT 0,
+    title TEXT,
+    summary TEXT,
+    data TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (published_date, id);
+CREATE INDEX IF NOT EXISTS idx_articles_source ON articles (source, published_date);
+CREATE TABLE IF NOT EXISTS article_categories (
+    category TEXT NOT NULL,
+    published_date TEXT NOT NULL,
+    article_id TEXT NOT NULL,
+    PRIMARY KEY (category, published_date, article_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_article_categories_article ON article_categories (article_id);
+"""
+
+UPSERT_ARTICLE = """
+INSERT INTO articles (id, source, published_date, sentiment, breaking_news, title, summary, data, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    source = excluded.source,
+    published_date = excluded.published_date,
+    sentiment = excluded.sentiment,
+    breaking_news = excluded.breaking_news,
+    title = excluded.title,
+    summary = excluded.summary,
+    data = excluded.data,
+    last_seen = excluded.last_seen
+"""
+
+
+def like_pattern(text):
+    """Build a LIKE pattern matching `text` anywhere, with wildcards in it escaped"""
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def encode_cursor(published_date, article_id):
+    """Encode the sort key of the last returned article as an opaque page cursor"""
+    return base64.urlsafe_b64encode(json.dumps([published_date, article_id]).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a page cursor, raising ValueError if it is malformed"""
+    try:
+        published_date, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return published_date, article_id
+
+
+class ArticleStore:
+    """Append-friendly SQLite history of every article the refresh cycle has seen
+
+    The database runs in WAL mode so request threads can read while the refresh
+    cycle writes. Each thread gets its own connection.
+    """
+
+    def __init__(self, path, retention_days=180):
+        self.path = path
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def upsert_articles(self, articles):
+        """Insert new articles and refresh the stored copy of ones seen before"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        connection = self._connection()
+
+        with connection:
+            connection.executemany(UPSERT_ARTICLE, [
+                (
+                    article['id'],
+                    article['source'],
+                    article['published_date'],
+                    article.get('sentiment'),
+                    1 if article.get('breaking_news') else 0,
+                    article.get('title', ''),
+                    article.get('summary', ''),
+                    json.dumps(dict(article)),
+                    now,
+                    now
+                )
+                for article in articles
+            ])
+            connection.executemany("DELETE FROM article_categories WHERE article_id = ?",
+                                   [(article['id'],) for article in articles])
+            connection.executemany("INSERT OR IGNORE INTO article_categories (category, published_date, article_id) VALUES (?, ?, ?)", [
+                (category, article['published_date'], article['id'])
+                for article in articles
+                for category in article.get('categories', [])
+            ])
+
+    def prune(self):
+        """Delete articles published before the retention window"""
+        # published_date is in UTC
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+        connection = self._connection()
+
+        with connection:
+            connection.execute("DELETE FROM article_categories WHERE published_date < ?", (cutoff,))
+            deleted = connection.execute("DELETE FROM articles WHERE published_date < ?", (cutoff,)).rowcount
+
+        if deleted:
+            logger.info(f"Pruned {deleted} articles published before {cutoff}")
+        return deleted
+
+    def query(self, since=None, until=None, source=None, category=None, sentiment=None,
+              breaking_only=False, search=None, cursor=None, limit=25):
+        """Return up to `limit` articles, newest first, and the cursor of the next page
+
+        `since` and `until` bound published_date inclusively. Pages are keyset
+        paginated on (published_date, id), so deep pages cost the same as the first.
+        """
+        clauses = []
+        params = []
+
+        if since:
+            clauses.append("published_date >= ?")
+            params.append(since)
+        if until:
+            clauses.append("published_date <= ?")
+            params.append(until)
+        if source:
+            clauses.append("source LIKE ? ESCAPE '\\'")
+            params.append(like_pattern(source))
+        if category:
+            clauses.append("id IN (SELECT article_id FROM article_categories WHERE category = ?"
+                           + (" AND published_date >= ?" if since else "")
+                           + (" AND published_date <= ?" if until else "") + ")")
+            params.append(category)
+            params.extend(value for value in (since, until) if value)
+        if sentiment:
+            clauses.append("sentiment = ?")
+            params.append(sentiment)
+        if breaking_only:
+            clauses.append("breaking_news = 1")
+        if search:
+            clauses.append("(title LIKE ? ESCAPE '\\' OR summary LIKE ? ESCAPE '\\')")
+            params.extend([like_pattern(search)] * 2)
+        if cursor:
+            published_date, article_id = decode_cursor(cursor)
+            clauses.append("(published_date < ? OR (published_date = ? AND id < ?))")
+            params.extend([published_date, published_date, article_id])
+
+        sql = "SELECT id, published_date, data FROM articles"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY published_date DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._connection().execute(sql, params).fetchall()
+        articles = [json.loads(row['data']) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last['published_date'], last['id'])
+        return articles, next_cursor
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Same statuses the requests engine retries
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Hop-by-hop headers are connection-specific and not allowed over HTTP/2
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'}
+
+# `error` is the exception that ended the request, or None if a response arrived
+FetchResult = namedtuple('FetchResult', 'status_code headers content error')
+
+
+class AsyncFeedFetcher:
+    """Fetches feeds on one long-lived event loop and pooled HTTP client
+
+    The loop runs in a daemon thread, so synchronous callers get
+    concurrent.futures.Future objects back. Keep-alive connections (multiplexed
+    over HTTP/2 when the server supports it) are reused across refresh cycles,
+    and requests to the same host wait on a per-host semaphore.
+    """
+
+    def __init__(self, headers=None, timeout=10, max_connections=8, per_host_limit=2,
+                 retries=3, backoff_factor=0.5, http2=True):
+        import httpx
+
+        self._httpx = httpx
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._host_limits = {}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-fetch', daemon=True)
+        self._thread.start()
+
+        headers = {key: value for key, value in (headers or {}).items() if key.lower() not in HOP_BY_HOP_HEADERS}
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = self._run(self._create_client(headers, timeout, limits, http2))
+
+    async def _create_client(self, headers, timeout, limits, http2):
+        return self._httpx.AsyncClient(headers=headers, timeout=timeout, limits=limits, http2=http2,
+                                       follow_redirects=True)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return limit
+
+    async def _get(self, url, headers):
+        async with self._host_limit(url):
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await self._client.get(url, headers=headers)
+                except self._httpx.TransportError:
+                    if attempt == self.retries:
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        return FetchResult(response.status_code, response.headers, response.content, None)
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def _fetch(self, url, headers, on_result, executor):
+        try:
+            result = await self._get(url, headers)
+        except Exception as e:
+            result = FetchResult(None, {}, b'', e)
+
+        if on_result is None:
+            return result
+        # Parsing is CPU-bound, keep it off the event loop
+        return await self._loop.run_in_executor(executor, on_result, result)
+
+    def submit(self, url, headers=None, on_result=None, executor=None):
+        """Start fetching `url` and return a Future of its FetchResult
+
+        If `on_result` is given it is called in `executor` with the FetchResult,
+        and the Future resolves to its return value instead.
+        """
+        return asyncio.run_coroutine_threadsafe(self._fetch(url, headers, on_result, executor), self._loop)
+
+    def close(self):
+        """Close the pooled connections and stop the event loop"""
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -1,6 +1,8 @@
 import hashlib
 import re
 
+from utils.keyword_matcher import KeywordMatcher
+
 CATEGORIES = {
     "Movies": ["movie", "film", "cinema", "box office", "hollywood", "director", "actor", "actress", "oscars", "academy awards"],
     "TV": ["tv", "television", "show", "series", "episode", "streaming", "netflix", "hulu", "disney+", "hbo", "amazon prime"],
@@ -14,17 +16,14 @@ BREAKING_KEYWORDS = [
     "breaking", "urgent", "just in", "alert", "exclusive", "update"
 ]
 
+category_matcher = KeywordMatcher(CATEGORIES)
+breaking_matcher = KeywordMatcher.from_keywords(BREAKING_KEYWORDS)
+
 def detect_categories(text):
-    text = text.lower()
-    categories = []
-    for category, keywords in CATEGORIES.items():
-        if any(keyword in text for keyword in keywords):
-            categories.append(category)
-    return categories or ["General"]
+    return category_matcher.match(text) or ["General"]
 
 def is_breaking_news(title, summary):
-    combined_text = (title + " " + summary).lower()
-    return any(keyword in combined_text for keyword in BREAKING_KEYWORDS)
+    return breaking_matcher.search(title + " " + summary)
 
 def generate_article_hash(title, link):
     content = (title + link).encode('utf-8')
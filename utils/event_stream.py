@@ -0,0 +1,125 @@
+import json
+import threading
+from collections import deque, namedtuple
+
+
+class StreamFilter(namedtuple('StreamFilter', 'source category sentiment breaking_only query')):
+    """The /rss filters a stream client subscribed with"""
+
+    def matches(self, article):
+        if self.source and self.source.lower() not in article.get('source', '').lower():
+            return False
+        if self.category and self.category not in article.get('categories', []):
+            return False
+        if self.sentiment and article.get('sentiment') != self.sentiment:
+            return False
+        if self.breaking_only and not article.get('breaking_news', False):
+            return False
+        if self.query:
+            query = self.query.lower()
+            if query not in article.get('title', '').lower() and query not in article.get('summary', '').lower():
+                return False
+        return True
+
+
+class StreamEvent:
+    """Difference between two consecutive snapshots adopted by this process
+
+    The old and new copies of every article are kept, so each subscriber's filter
+    can decide whether an edit moved an article into or out of its view.
+    """
+
+    def __init__(self, event_id, added, updated, removed):
+        self.id = event_id
+        self.added = added
+        self.updated = updated  # (old, new) pairs
+        self.removed = removed
+        self._rendered = {}
+
+    def render(self, stream_filter):
+        """Return the JSON diff seen through `stream_filter`, or None if nothing in it matches"""
+        if stream_filter in self._rendered:
+            return self._rendered[stream_filter]
+
+        added = [article for article in self.added if stream_filter.matches(article)]
+        updated = []
+        removed = [article['id'] for article in self.removed if stream_filter.matches(article)]
+
+        for old, new in self.updated:
+            was_visible = stream_filter.matches(old)
+            is_visible = stream_filter.matches(new)
+            if was_visible and is_visible:
+                fields = {key: new.get(key) for key in set(old) | set(new) if old.get(key) != new.get(key)}
+                updated.append({'id': new['id'], 'fields': fields})
+            elif is_visible:
+                added.append(new)
+            elif was_visible:
+                removed.append(old['id'])
+
+        data = None
+        if added or updated or removed:
+            data = json.dumps({'added': added, 'updated': updated, 'removed': removed}, separators=(',', ':'), default=dict)
+        self._rendered[stream_filter] = data
+        return data
+
+
+class EventStream:
+    """Ring buffer of snapshot diffs that stream subscribers wait on
+
+    Event ids are snapshot versions, so a client can resume from Last-Event-ID on
+    any worker that adopted the same snapshots. Clients whose last event fell out
+    of the buffer have to start over from a full snapshot.
+    """
+
+    def __init__(self, buffer_size=100):
+        self._events = deque(maxlen=buffer_size)
+        self._articles = []
+        self._last_id = None
+        self._condition = threading.Condition()
+
+    def publish(self, event_id, articles):
+        """Record the diff between the last published articles and `articles`"""
+        with self._condition:
+            if event_id == self._last_id:
+                return None
+
+            previous = {article['id']: article for article in self._articles}
+            current = {article['id']: article for article in articles}
+            added = [article for article_id, article in current.items() if article_id not in previous]
+            # Unchanged articles are usually the very same records, which skips comparing their fields
+            updated = [(previous[article_id], article) for article_id, article in current.items()
+                       if article_id in previous and previous[article_id] is not article
+                       and previous[article_id] != article]
+            removed = [article for article_id, article in previous.items() if article_id not in current]
+
+            event = StreamEvent(event_id, added, updated, removed)
+            self._events.append(event)
+            self._articles = list(articles)
+            self._last_id = event_id
+            self._condition.notify_all()
+            return event
+
+    def snapshot(self):
+        """Return the id of the last event and the articles as of that event"""
+        with self._condition:
+            return self._last_id, self._articles
+
+    def _events_after(self, event_id):
+        if event_id == self._last_id:
+            return []
+        for position, event in enumerate(self._events):
+            if event.id == event_id:
+                return list(self._events)[position + 1:]
+        return None
+
+    def wait(self, event_id, timeout):
+        """Return the events after `event_id`, blocking up to `timeout` seconds for one
+
+        Returns an empty list on timeout and None if `event_id` is no longer buffered.
+        """
+        with self._condition:
+            events = self._events_after(event_id)
+            if events == []:
+                self._condition.wait(timeout)
+                events = self._events_after(event_id)
+            return events
@@ -0,0 +1,78 @@
+import json
+import threading
+
+from utils.article import Article
+
+# Redis layout shared by the fetcher shards and the snapshot builder
+CHANGED_FEEDS = 'feeds:changed'  # list of names of feeds changed since the builder last drained it
+FEED_ARTICLES = 'feeds:articles'  # feed name -> JSON list of its latest articles
+
+
+class FeedQueue:
+    """Feeds whose articles changed since the snapshot builder last took them
+
+    A feed pushed again before it is taken keeps one place in the queue, with
+    its latest articles, so the builder's work grows with the number of
+    changed feeds rather than with how often they changed.
+    """
+
+    def __init__(self):
+        self._changed = {}
+        self._lock = threading.Lock()
+
+    def push(self, changed):
+        """Queue {feed name: article records} of feeds that changed"""
+        with self._lock:
+            self._changed.update(changed)
+
+    def pending(self):
+        with self._lock:
+            return len(self._changed)
+
+    def drain(self, everything=False):
+        """Take {feed name: article records} of every queued feed
+
+        This queue only holds the feeds of its own process, whose articles the
+        builder already has, so `everything` adds nothing here.
+        """
+        with self._lock:
+            changed, self._changed = self._changed, {}
+        return changed
+
+
+class RedisFeedQueue:
+    """The same queue shared through Redis by fetchers running in other processes or hosts
+
+    Each fetcher stores the latest articles of a changed feed in one hash and
+    appends its name to a list; the builder takes the list and reads only those
+    feeds back. The hash keeps every feed's latest articles, so a builder that
+    just took over can read them all with `everything`.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def push(self, changed):
+        if not changed:
+            return
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(FEED_ARTICLES, mapping={name: json.dumps([dict(article) for article in articles], separators=(',', ':'))
+                                          for name, articles in changed.items()})
+        pipe.rpush(CHANGED_FEEDS, *changed)
+        pipe.execute()
+
+    def pending(self):
+        return self.client.llen(CHANGED_FEEDS)
+
+    def drain(self, everything=False):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.lrange(CHANGED_FEEDS, 0, -1)
+        pipe.delete(CHANGED_FEEDS)
+        names = list(dict.fromkeys(pipe.execute()[0]))
+
+        if everything:
+            blobs = self.client.hgetall(FEED_ARTICLES)
+        else:
+            blobs = dict(zip(names, self.client.hmget(FEED_ARTICLES, names))) if names else {}
+        return {name: [Article.from_dict(article) for article in json.loads(blob)]
+                for name, blob in blobs.items() if blob is not None}
@@ -0,0 +1,103 @@
+import json
+import sqlite3
+import zlib
+
+# Registry files with these extensions are SQLite databases with a `feeds` table, anything else is JSON
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+FEEDS_QUERY = "SELECT name, url, weight, poll_interval, categories, enabled FROM feeds"
+
+
+class Feed:
+    """One registered feed and its settings
+
+    `weight` multiplies the trending score of its articles, `poll_interval`
+    fixes how often it is polled instead of learning it from how often it
+    publishes, and `categories` are added to the categories detected in each of
+    its articles. Disabled feeds are neither fetched nor served.
+    """
+
+    __slots__ = ('name', 'url', 'weight', 'poll_interval', 'categories', 'enabled')
+
+    def __init__(self, name, url, weight=1.0, poll_interval=None, categories=(), enabled=True):
+        self.name = name
+        self.url = url
+        self.weight = weight
+        self.poll_interval = poll_interval
+        self.categories = tuple(categories)
+        self.enabled = enabled
+
+    @classmethod
+    def from_dict(cls, data, default_weight=1.0):
+        """Validate one registry entry; `categories` may be a list or a comma-separated string"""
+        if not isinstance(data, dict) or not data.get('name') or not data.get('url'):
+            raise ValueError(f"Feed entries need a name and a url: {data!r}")
+
+        categories = data.get('categories') or ()
+        if isinstance(categories, str):
+            categories = [category.strip() for category in categories.split(',') if category.strip()]
+        weight = data.get('weight')
+        poll_interval = data.get('poll_interval')
+        enabled = data.get('enabled', True)
+        try:
+            return cls(
+                name=str(data['name']),
+                url=str(data['url']),
+                weight=default_weight if weight is None else float(weight),
+                poll_interval=float(poll_interval) if poll_interval else None,
+                categories=[str(category) for category in categories],
+                enabled=enabled if isinstance(enabled, bool) else str(enabled).lower() in ('1', 'true', 'yes')
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid settings for feed {data['name']!r}: {str(e)}")
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def shard_of(name, shards):
+    """Return the fetcher shard, out of `shards`, that polls the feed called `name`"""
+    return zlib.crc32(name.encode('utf-8')) % shards
+
+
+def read_feed_entries(path):
+    """Read the raw feed entries of a JSON registry file or a SQLite registry database
+
+    A JSON file holds a list of feeds, or {"feeds": [...]}. A database has a
+    `feeds` table with the columns name, url, weight, poll_interval, categories
+    (comma-separated) and enabled.
+    """
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        # Opened read-only, so a missing database is an error rather than a new empty file
+        connection = None
+        try:
+            connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            connection.row_factory = sqlite3.Row
+            return [dict(row) for row in connection.execute(FEEDS_QUERY)]
+        except sqlite3.Error as e:
+            raise ValueError(f"{path}: {str(e)}")
+        finally:
+            if connection is not None:
+                connection.close()
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data.get('feeds') if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: expected a list of feeds or {{\"feeds\": [...]}}")
+    return entries
+
+
+def load_feed_registry(path, default_weights=None):
+    """Return {name: Feed} read from the registry at `path`, in file order
+
+    Feeds without a weight take theirs from `default_weights`, then 1. A name
+    listed twice keeps its last entry.
+    """
+    default_weights = default_weights or {}
+    feeds = {}
+    for entry in read_feed_entries(path):
+        name = entry.get('name') if isinstance(entry, dict) else None
+        feed = Feed.from_dict(entry, default_weight=default_weights.get(name, 1.0))
+        feeds[feed.name] = feed
+    return feeds
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import re
+
+# Keywords also match their plural (film -> films, box office -> box offices)
+PLURAL_SUFFIX = r'(?:e?s)?'
+
+
+def normalize_keyword(keyword):
+    """Lowercase a keyword and collapse its internal whitespace"""
+    return ' '.join(keyword.lower().split())
+
+
+def trie_pattern(keywords):
+    """Build a regex alternation of `keywords` factored by common prefix
+
+    "star", "stars" and "streaming" become st(?:ar|reaming), so the regex engine
+    tries each character once per position instead of once per keyword.
+    """
+    root = {}
+    for keyword in keywords:
+        node = root
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [(r'\s+' if char == ' ' else re.escape(char)) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A keyword ends here, so the rest is optional
+        return f'(?:{body})?' if '' in node else body
+
+    return build(root)
+
+
+class KeywordMatcher:
+    """Finds which labels' keywords occur in a text in a single regex pass
+
+    All keywords of all labels are compiled into one prefix-factored alternation,
+    anchored so a keyword only matches as a whole word: "star" matches "star" and
+    "stars" but not "start", and "tv" does not match "tvOS". Multi-word keywords
+    match across any run of whitespace. The cost of a scan grows with the text,
+    not with the number of keywords.
+    """
+
+    def __init__(self, keyword_sets):
+        self.keyword_sets = {label: [normalize_keyword(keyword) for keyword in keywords if keyword.strip()]
+                             for label, keywords in keyword_sets.items()}
+        self.labels = list(self.keyword_sets)
+
+        self._labels_by_keyword = {}
+        for label, keywords in self.keyword_sets.items():
+            for keyword in keywords:
+                self._labels_by_keyword.setdefault(keyword, set()).add(label)
+
+        # An empty table compiles to a pattern that never matches
+        alternation = trie_pattern(self._labels_by_keyword) or '(?!)'
+        self._pattern = re.compile(rf'(?<!\w)({alternation}){PLURAL_SUFFIX}(?!\w)')
+
+        table = json.dumps(self.keyword_sets, sort_keys=True).encode('utf-8')
+        self.digest = hashlib.md5(table).hexdigest()
+
+    @classmethod
+    def from_keywords(cls, keywords, label='match'):
+        """Build a matcher with a single label, for plain yes/no keyword lists"""
+        return cls({label: keywords})
+
+    def match(self, text):
+        """Return the labels with at least one keyword in `text`, in table order"""
+        found = set()
+        for match in self._pattern.finditer(text.lower()):
+            found.update(self._labels_by_keyword[normalize_keyword(match.group(1))])
+            if len(found) == len(self.labels):
+                break
+        return [label for label in self.labels if label in found]
+
+    def search(self, text):
+        """Return True if any keyword occurs in `text`"""
+        return self._pattern.search(text.lower()) is not None
+
+
+def load_keyword_file(path):
+    """Read user keyword sets from a JSON file
+
+    The file holds {"categories": {label: [keywords]}, "breaking": [keywords]};
+    either key may be left out.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    categories = data.get('categories', {})
+    breaking = data.get('breaking')
+    if not isinstance(categories, dict) or not all(isinstance(words, list) for words in categories.values()):
+        raise ValueError(f"{path}: 'categories' must map category names to keyword lists")
+    if breaking is not None and not isinstance(breaking, list):
+        raise ValueError(f"{path}: 'breaking' must be a list of keywords")
+    return categories, breaking
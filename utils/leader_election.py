@@ -0,0 +1,111 @@
+import os
+import uuid
+import socket
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Extend the lease only if we still own it, so an expired leader can't steal it back
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class FileLockElection:
+    """Elect one fetcher among the processes of a host with an exclusive flock
+
+    The lock is held for the lifetime of the process and released by the kernel when
+    the leader exits, at which point the next follower to poll takes over.
+    """
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError("File lock election requires fcntl")
+        self.path = path
+        self.is_leader = False
+        self._fd = None
+
+    def try_acquire(self):
+        """Return True if this process holds the lock, acquiring it if it is free"""
+        if self.is_leader:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        # Record the owner for debugging; the lock itself is what matters
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode('utf-8'))
+        self._fd = fd
+        self.is_leader = True
+        logger.info(f"Process {os.getpid()} elected feed fetcher via {self.path}")
+        return True
+
+    def release(self):
+        """Give up leadership"""
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self.is_leader = False
+
+
+class RedisLockElection:
+    """Elect one fetcher across processes and hosts with an expiring Redis key
+
+    The leader renews the key on every call; if it stops renewing for `ttl` seconds
+    the key expires and another process wins the next `SET NX`. The key holds
+    'host:pid:nonce', so other processes can tell which host leads.
+    """
+
+    def __init__(self, client, key='feed_fetcher_leader', ttl=60):
+        self.client = client
+        self.key = key
+        self.ttl = ttl
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        self.is_leader = False
+
+    def try_acquire(self):
+        """Return True if this process holds the lease, acquiring or renewing it"""
+        try:
+            if self.is_leader and self.client.eval(RENEW_SCRIPT, 1, self.key, self.token, self.ttl):
+                return True
+
+            was_leader = self.is_leader
+            self.is_leader = bool(self.client.set(self.key, self.token, nx=True, ex=self.ttl))
+            if was_leader and not self.is_leader:
+                logger.warning("Lost feed fetcher leadership")
+            elif self.is_leader and not was_leader:
+                logger.info(f"Process {os.getpid()} elected feed fetcher via Redis key {self.key}")
+        except Exception as e:
+            logger.error(f"Leader election error: {str(e)}")
+            self.is_leader = False
+
+        return self.is_leader
+
+    def release(self):
+        """Give up leadership if we still hold the lease"""
+        try:
+            if self.client.get(self.key) == self.token:
+                self.client.delete(self.key)
+        except Exception as e:
+            logger.error(f"Leader election error: {str(e)}")
+        self.is_leader = False
+
+
+def lease_holder_host(client, key):
+    """Return the host of the process holding the Redis lease `key`, or None if nobody holds it"""
+    token = client.get(key)
+    return token.split(':', 1)[0] if token else None
@@ -0,0 +1,185 @@
+import bisect
+import math
+import threading
+import time
+from collections import deque
+
+# Observations folded by the observing thread once this many are pending, so nothing piles up between scrapes
+FOLD_THRESHOLD = 4096
+
+# WSGI environ key under which RequestClock stamps the start of a request
+REQUEST_START = 'metrics.request_start'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    """A metric family whose updates are queued without taking a lock
+
+    Observing appends to a deque, which is atomic, so request threads never
+    wait on each other or on a scrape. Queued updates are folded into the
+    family when it is scraped, or by an observing thread once FOLD_THRESHOLD
+    are pending, if no one else is folding at that moment.
+    """
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def _record(self, item):
+        self._pending.append(item)
+        if len(self._pending) > FOLD_THRESHOLD and self._lock.acquire(blocking=False):
+            try:
+                self._fold()
+            finally:
+                self._lock.release()
+
+    def _fold(self):
+        for _ in range(len(self._pending)):
+            self._apply(*self._pending.popleft())
+
+    def collect(self):
+        """Return the exposition lines of the family"""
+        with self._lock:
+            self._fold()
+            return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}'] + self._lines()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._record((labels, amount))
+
+    def values(self):
+        """Return the current value of every label set"""
+        with self._lock:
+            self._fold()
+            return dict(self._values)
+
+    def _apply(self, labels, amount):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _lines(self):
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}'
+                for labels, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # labels -> [count per bucket, sum, count]
+
+    def observe(self, value, *labels, count=1):
+        """Record `value`, `count` times"""
+        self._record((labels, value, count))
+
+    def _apply(self, labels, value, count):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += count
+        series[1] += value * count
+        series[2] += count
+
+    def _lines(self):
+        lines = []
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, labels, ("le", format_value(float(bound))))} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(round(total, 9))}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Counter or gauge read from existing state when scraped
+
+    `callback` returns a number, or a dict of label value tuples to numbers.
+    """
+
+    def __init__(self, name, help, type, callback, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.callback = callback
+
+    def _lines(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}'
+                for labels, value in sorted(values.items()) if value is not None]
+
+
+class RequestClock:
+    """WSGI middleware stamping the start of every request in its environ
+
+    Request handlers read it from `request.environ[REQUEST_START]`, which is
+    cheaper than a before_request hook storing it on `g`.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        environ[REQUEST_START] = time.perf_counter()
+        return self.wsgi_app(environ, start_response)
+
+
+class MetricsRegistry:
+    """The metric families exposed on /metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, buckets, labelnames=()):
+        return self.register(Histogram(name, help, buckets, labelnames))
+
+    def gauge_callback(self, name, help, callback, labelnames=()):
+        return self.register(CallbackMetric(name, help, 'gauge', callback, labelnames))
+
+    def counter_callback(self, name, help, callback, labelnames=()):
+        return self.register(CallbackMetric(name, help, 'counter', callback, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,143 @@
+import random
+import re
+import threading
+import zlib
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def shingles(text, size=2):
+    """Return the set of `size`-word shingles of lowercased, punctuation-free text"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index of article texts, for finding the same story from several sources
+
+    Every article's title and summary are reduced to word shingles and a MinHash
+    signature, which is split into bands. Articles sharing a band bucket are
+    candidates, and candidates whose signatures agree on at least `threshold` of
+    their positions (an estimate of shingle Jaccard similarity) are linked as
+    near duplicates. Adding an article only touches the buckets of its own
+    bands, so its cost does not grow with the number of indexed articles.
+    Signatures and links are kept between cycles, so each cycle only does that
+    work for new or edited articles; records seen before are recognised by
+    identity without rebuilding their text.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.5, shingle_size=2, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        rng = random.Random(seed)
+        self._permutations = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+                              for _ in range(num_perm)]
+        self._entries = {}  # article id -> (text, signature, source)
+        self._records = {}  # article id -> the article record last indexed under it
+        self._buckets = {}  # (band, band values) -> set of article ids
+        self._links = {}  # article id -> ids of its near duplicates from other sources
+        self._lock = threading.Lock()
+
+    def signature(self, text):
+        """Return the MinHash signature of `text`, or None if it has no words"""
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text, self.shingle_size)]
+        if not hashes:
+            return None
+        return tuple(min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes)
+                     for a, b in self._permutations)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def _add(self, article_id, text, source):
+        signature = self.signature(text)
+        self._entries[article_id] = (text, signature, source)
+        if signature is None:
+            return
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            bucket = self._buckets.setdefault(key, set())
+            candidates.update(bucket)
+            bucket.add(article_id)
+
+        for other_id in candidates:
+            _, other_signature, other_source = self._entries[other_id]
+            if other_source != source and self._similarity(signature, other_signature) >= self.threshold:
+                self._links.setdefault(article_id, set()).add(other_id)
+                self._links.setdefault(other_id, set()).add(article_id)
+
+    def _remove(self, article_id):
+        self._records.pop(article_id, None)
+        _, signature, _ = self._entries.pop(article_id)
+        if signature is not None:
+            for key in self._band_keys(signature):
+                bucket = self._buckets[key]
+                bucket.discard(article_id)
+                if not bucket:
+                    del self._buckets[key]
+
+        for other_id in self._links.pop(article_id, ()):
+            linked = self._links[other_id]
+            linked.discard(article_id)
+            if not linked:
+                del self._links[other_id]
+
+    def _similarity(self, first, second):
+        return sum(a == b for a, b in zip(first, second)) / self.num_perm
+
+    def update(self, articles, text_of):
+        """Sync the index with `articles` and return groups of near-duplicate article ids
+
+        New and edited articles are indexed, articles no longer present are dropped.
+        Only articles from different sources are linked. Each group has at least
+        two ids; articles without near duplicates are left out.
+        """
+        with self._lock:
+            current = {article['id']: article for article in articles}
+            for article_id in [article_id for article_id in self._entries if article_id not in current]:
+                self._remove(article_id)
+            for article_id, article in current.items():
+                if self._records.get(article_id) is article:
+                    continue
+                text = text_of(article)
+                entry = self._entries.get(article_id)
+                if entry is None or entry[0] != text:
+                    if entry is not None:
+                        self._remove(article_id)
+                    self._add(article_id, text, article.get('source'))
+                self._records[article_id] = article
+
+            # Connected components of the links; unlinked articles are never visited
+            groups = []
+            seen = set()
+            for article_id in sorted(self._links):
+                if article_id in seen:
+                    continue
+                group, stack = [], [article_id]
+                seen.add(article_id)
+                while stack:
+                    member = stack.pop()
+                    group.append(member)
+                    for other_id in self._links[member]:
+                        if other_id not in seen:
+                            seen.add(other_id)
+                            stack.append(other_id)
+                groups.append(group)
+            return groups
+
+    def stats(self):
+        """Return index size for monitoring"""
+        with self._lock:
+            return {'articles': len(self._entries), 'buckets': len(self._buckets), 'linked': len(self._links)}
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import deque
+
+
+def item_count(value):
+    """Size of a stage's input or output: its length, or the value itself for counts"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return len(value)
+
+
+class Stage:
+    """Duration and sizes of one stage of a refresh cycle, timed as a `with` block"""
+
+    __slots__ = ('name', 'input', 'output', 'seconds', '_cycle', '_started')
+
+    def __init__(self, cycle, name, items):
+        self.name = name
+        self.input = item_count(items)
+        self.output = None
+        self.seconds = None
+        self._cycle = cycle
+        self._started = None
+
+    def done(self, items):
+        """Record what the stage produced"""
+        self.output = item_count(items)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.seconds = time.perf_counter() - self._started
+        self._cycle.stages.append({'name': self.name, 'seconds': round(self.seconds, 6),
+                                   'input': self.input, 'output': self.output})
+        return False
+
+
+class Cycle:
+    """Stages of one refresh cycle, in the order they ran"""
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self._started = time.perf_counter()
+        self.started = time.time()
+        self.stages = []
+
+    def stage(self, name, items=None):
+        """Return a Stage timing the body of a `with` block; `items` is its input"""
+        return Stage(self, name, items)
+
+    def finish(self, generation=None):
+        """Add the cycle to the ring buffer"""
+        self._metrics.append({
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(self.started)),
+            'seconds': round(time.perf_counter() - self._started, 6),
+            'generation': generation,
+            'stages': self.stages
+        })
+
+
+class PipelineMetrics:
+    """Ring buffer of the stage timings of the last `buffer_size` refresh cycles
+
+    Every cycle records each named stage's duration and how many items it took
+    in and produced, so the stage that dominates a cycle, and how it grows as
+    sources are added, can be read off /metrics.
+    """
+
+    def __init__(self, buffer_size=50):
+        self._cycles = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    def start_cycle(self):
+        return Cycle(self)
+
+    def append(self, cycle):
+        with self._lock:
+            self._cycles.append(cycle)
+
+    def cycles(self):
+        """Return the buffered cycles, oldest first"""
+        with self._lock:
+            return list(self._cycles)
+
+    def summary(self):
+        """Return duration statistics of every stage over the buffered cycles, in pipeline order"""
+        runs = {}
+        for cycle in self.cycles():
+            for stage in cycle['stages']:
+                runs.setdefault(stage['name'], []).append(stage)
+
+        summary = []
+        for name, stages in runs.items():
+            seconds = sorted(stage['seconds'] for stage in stages)
+            summary.append({
+                'name': name,
+                'runs': len(stages),
+                'mean_seconds': round(sum(seconds) / len(seconds), 6),
+                'p50_seconds': seconds[len(seconds) // 2],
+                'max_seconds': seconds[-1],
+                'last_seconds': stages[-1]['seconds'],
+                'last_input': stages[-1]['input'],
+                'last_output': stages[-1]['output']
+            })
+        return summary
@@ -0,0 +1,101 @@
+import time
+import threading
+
+
+class SourceSchedule:
+    """Polling state of one source"""
+
+    __slots__ = ('interval', 'next_poll', 'last_poll', 'arrival_rate', 'failures')
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_poll = 0.0
+        self.last_poll = None
+        self.arrival_rate = None  # Smoothed new articles per second
+        self.failures = 0
+
+
+class PollScheduler:
+    """Per-source poll intervals learned from how often each feed publishes
+
+    Every poll updates an exponentially weighted estimate of the source's new
+    article rate, counting a 304 as zero new articles. The next poll is scheduled
+    for when about `target_articles` new articles are expected, clamped to
+    [min_interval, max_interval]. Sources given a fixed interval are polled on
+    it instead. Failing sources back off exponentially up to max_interval, or
+    their fixed interval if longer.
+    """
+
+    def __init__(self, min_interval=15, max_interval=900, target_articles=0.25, smoothing=0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_articles = target_articles
+        self.smoothing = smoothing
+        self._sources = {}
+        self._fixed = {}  # source name -> fixed poll interval
+        self._lock = threading.Lock()
+
+    def _schedule(self, source_name):
+        schedule = self._sources.get(source_name)
+        if schedule is None:
+            schedule = self._sources[source_name] = SourceSchedule(self.min_interval)
+        return schedule
+
+    def set_fixed_intervals(self, intervals):
+        """Poll the sources of {name: seconds} on those intervals from their next poll on, the others as learned"""
+        with self._lock:
+            self._fixed = dict(intervals)
+
+    def due(self, source_names, now=None):
+        """Return the sources whose next poll time has passed; unseen sources are due at once"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [name for name in source_names if self._schedule(name).next_poll <= now]
+
+    def seconds_until_due(self, source_names, now=None):
+        """Return how long until the next of `source_names` is due, at most max_interval"""
+        now = time.time() if now is None else now
+        with self._lock:
+            next_poll = min((self._schedule(name).next_poll for name in source_names), default=now + self.max_interval)
+        return min(self.max_interval, max(0.0, next_poll - now))
+
+    def record(self, source_name, new_articles, failed=False, now=None):
+        """Learn from one poll of `source_name` and schedule the next one"""
+        now = time.time() if now is None else now
+        with self._lock:
+            schedule = self._schedule(source_name)
+            fixed = self._fixed.get(source_name)
+
+            if failed:
+                schedule.failures += 1
+                base = fixed or self.min_interval
+                schedule.interval = min(max(self.max_interval, base), base * 2 ** schedule.failures)
+            else:
+                schedule.failures = 0
+                if schedule.last_poll is not None:
+                    rate = new_articles / max(now - schedule.last_poll, 1.0)
+                    if schedule.arrival_rate is None:
+                        schedule.arrival_rate = rate
+                    else:
+                        schedule.arrival_rate += self.smoothing * (rate - schedule.arrival_rate)
+
+                if fixed:
+                    schedule.interval = fixed
+                else:
+                    if schedule.arrival_rate:
+                        interval = self.target_articles / schedule.arrival_rate
+                    else:
+                        # No arrivals seen yet: slow down gradually instead of jumping to the maximum
+                        interval = schedule.interval * 2
+                    schedule.interval = min(self.max_interval, max(self.min_interval, interval))
+                schedule.last_poll = now
+
+            schedule.next_poll = now + schedule.interval
+
+    def stats(self):
+        """Return the current interval and failure count of every source"""
+        with self._lock:
+            return {
+                name: {'interval': round(schedule.interval, 1), 'failures': schedule.failures}
+                for name, schedule in self._sources.items()
+            }
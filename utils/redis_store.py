@@ -0,0 +1,255 @@
+import json
+import hashlib
+import logging
+import uuid
+
+from utils.article import RecordCache
+from utils.trending import article_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Each article is stored once in ARTICLES; the sorted sets only hold ids
+ARTICLES = 'articles'  # id -> article JSON
+DIGESTS = 'articles:digest'  # id -> digest of the stored JSON
+BY_DATE = 'articles:by_date'  # id scored by published timestamp
+TRENDING = 'articles:trending'  # id scored by trending score
+CATEGORY = 'articles:category:{}'  # id scored by published timestamp
+SOURCE = 'articles:source:{}'  # id scored by published timestamp
+META = 'articles:meta'  # JSON of stats, health and snapshot generation
+STORIES = 'articles:stories'  # story id -> story JSON, in META's story_order
+FEED_VALIDATORS = 'articles:feed_validators'  # source -> conditional GET validators JSON
+SOURCE_COUNTS = 'articles:source_counts'  # source -> number of its articles in the feed
+WRITER = 'articles:writer'  # id of the store that wrote last
+GENERATION = 'snapshot_generation'
+
+# Extras too large to rewrite every cycle, kept in hashes written as diffs
+SECTIONS = {
+    'stories': STORIES,
+    'feed_validators': FEED_VALIDATORS,
+    'source_article_counts': SOURCE_COUNTS,
+}
+
+WRITE_ATTEMPTS = 3
+
+
+def published_timestamp(article):
+    """Score an article by its published time, 0 if it has none"""
+    return article_timestamp(article) or 0
+
+
+class RedisArticleStore:
+    """Incrementally maintained Redis copy of the current articles
+
+    The writer remembers what it last wrote, so each cycle only sends new, changed
+    and removed articles, in one MULTI/EXEC pipeline. Stories, feed validators and
+    per-source counts are written the same way, one hash field per entry. Each
+    write stamps WRITER with this store's id and WATCHes it: while it still holds
+    that id nobody else has written, and the diff needs no reads. Otherwise the
+    writer re-reads the stored digests and decodes only the articles another
+    writer changed. Readers keep the articles they already decoded and fetch
+    only those whose digest changed.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.writer_id = uuid.uuid4().hex
+        self._synced = False  # whether the state below is what Redis holds
+        self._written = {}  # id -> (digest, source, categories) as stored in Redis
+        self._digests = RecordCache()  # digest of each record written, so unchanged records are not encoded again
+        self._trending = {}  # id -> trending score as stored in Redis
+        self._sections = {key: {} for key in SECTIONS.values()}  # field -> JSON as stored in each section hash
+        self._known = {}  # id -> (digest, article) decoded by read()
+
+    def _sync_written(self):
+        """Learn what is stored in Redis now, including what other processes wrote, so the diff removes stale entries"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hgetall(DIGESTS)
+        pipe.zrange(TRENDING, 0, -1, withscores=True)
+        for key in SECTIONS.values():
+            pipe.hgetall(key)
+        digests, trending, *sections = pipe.execute()
+
+        written = {article_id: entry for article_id, entry in self._written.items()
+                   if digests.get(article_id) == entry[0]}
+        unknown = [article_id for article_id in digests if article_id not in written]
+        if unknown:
+            for article_id, blob in zip(unknown, self.client.hmget(ARTICLES, unknown)):
+                article = json.loads(blob) if blob else {}
+                written[article_id] = (digests[article_id], article.get('source', ''), tuple(article.get('categories', [])))
+        self._written = written
+        self._trending = dict(trending)
+        self._sections = dict(zip(SECTIONS.values(), sections))
+
+    def write(self, feed, trending, meta, generation):
+        """Write the diff between the last written state and `feed` / `trending`
+
+        Returns the number of (changed, removed) articles.
+        """
+        from redis.exceptions import WatchError
+
+        self._digests.rotate()
+        for attempt in range(WRITE_ATTEMPTS):
+            with self.client.pipeline(transaction=True) as pipe:
+                try:
+                    pipe.watch(WRITER)
+                    if not self._synced or pipe.get(WRITER) != self.writer_id:
+                        self._sync_written()
+                    pipe.multi()
+                    current, trending_scores, sections, removed = self._queue_diff(pipe, feed, trending, meta)
+                    pipe.set(WRITER, self.writer_id)
+                    pipe.set(GENERATION, generation)
+                    pipe.execute()
+                except WatchError:
+                    # Another writer got in between; learn what it wrote and diff again
+                    self._synced = False
+                    continue
+                except Exception:
+                    self._synced = False
+                    raise
+
+            changed = sum(1 for article_id, entry in current.items() if self._written.get(article_id, (None,))[0] != entry[0])
+            self._written = current
+            self._trending = trending_scores
+            self._sections = sections
+            self._synced = True
+            return changed, len(removed)
+        raise WatchError(f"Redis articles kept changing during {WRITE_ATTEMPTS} write attempts")
+
+    def _queue_diff(self, pipe, feed, trending, meta):
+        """Queue the writes that turn the stored state into `feed` / `trending` / `meta` on `pipe`"""
+        current = {}
+        for article in feed:
+            blob = None
+            digest = self._digests.get(article)
+            if digest is None:
+                blob = json.dumps(dict(article), sort_keys=True)
+                digest = self._digests.put(article, hashlib.md5(blob.encode('utf-8')).hexdigest())
+            article_id = article['id']
+            categories = tuple(article.get('categories', []))
+            current[article_id] = (digest, article['source'], categories)
+
+            previous = self._written.get(article_id)
+            if previous is not None and previous[0] == digest:
+                continue
+
+            if blob is None:
+                blob = json.dumps(dict(article), sort_keys=True)
+            score = published_timestamp(article)
+            pipe.hset(ARTICLES, article_id, blob)
+            pipe.hset(DIGESTS, article_id, digest)
+            pipe.zadd(BY_DATE, {article_id: score})
+            pipe.zadd(SOURCE.format(article['source']), {article_id: score})
+            for category in categories:
+                pipe.zadd(CATEGORY.format(category), {article_id: score})
+
+            # Drop memberships the edited article no longer has
+            if previous is not None:
+                if previous[1] != article['source']:
+                    pipe.zrem(SOURCE.format(previous[1]), article_id)
+                for category in set(previous[2]) - set(categories):
+                    pipe.zrem(CATEGORY.format(category), article_id)
+
+        removed = [article_id for article_id in self._written if article_id not in current]
+        for article_id in removed:
+            _, source, categories = self._written[article_id]
+            pipe.hdel(ARTICLES, article_id)
+            pipe.hdel(DIGESTS, article_id)
+            pipe.zrem(BY_DATE, article_id)
+            pipe.zrem(SOURCE.format(source), article_id)
+            for category in categories:
+                pipe.zrem(CATEGORY.format(category), article_id)
+
+        trending_scores = {article['id']: float(article.get('trending_score', 0)) for article in trending}
+        stale_trending = [article_id for article_id in self._trending if article_id not in trending_scores]
+        if stale_trending:
+            pipe.zrem(TRENDING, *stale_trending)
+        changed_scores = {article_id: score for article_id, score in trending_scores.items()
+                          if self._trending.get(article_id) != score}
+        if changed_scores:
+            pipe.zadd(TRENDING, changed_scores)
+
+        meta = dict(meta)
+        stories = meta.pop('stories', [])
+        entries = {
+            STORIES: {story['id']: story for story in stories},
+            FEED_VALIDATORS: meta.pop('feed_validators', {}),
+            SOURCE_COUNTS: meta.pop('source_article_counts', {}),
+        }
+        sections = {}
+        for key, values in entries.items():
+            blobs = {str(field): json.dumps(value, sort_keys=True) for field, value in values.items()}
+            written = self._sections.get(key, {})
+            stale = [field for field in written if field not in blobs]
+            if stale:
+                pipe.hdel(key, *stale)
+            changed = {field: blob for field, blob in blobs.items() if written.get(field) != blob}
+            if changed:
+                pipe.hset(key, mapping=changed)
+            sections[key] = blobs
+
+        # Scores are rounded, so ties in Redis may not be ties for the ranker; keep its exact order
+        meta['trending_order'] = list(trending_scores)
+        meta['story_order'] = [story['id'] for story in stories]
+        pipe.set(META, json.dumps(meta))
+        return current, trending_scores, sections, removed
+
+    def read(self, category_limit=50):
+        """Read the stored views as {'generation', 'views', 'extras'}, or None if nothing is stored"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(GENERATION)
+        pipe.get(META)
+        pipe.hgetall(DIGESTS)
+        pipe.zrevrange(BY_DATE, 0, -1)
+        pipe.zrange(TRENDING, 0, -1, withscores=True)
+        for key in SECTIONS.values():
+            pipe.hgetall(key)
+        generation, meta, digests, by_date, trending, stories, validators, counts = pipe.execute()
+
+        if not meta or not by_date:
+            return None
+        meta = json.loads(meta)
+        # A META written before the sections were split out still holds them itself
+        story_order = meta.pop('story_order', None)
+        if story_order is not None:
+            meta['stories'] = [json.loads(stories[story_id]) for story_id in story_order if story_id in stories]
+        if validators:
+            meta['feed_validators'] = {source: json.loads(blob) for source, blob in validators.items()}
+        if counts:
+            meta['source_article_counts'] = {source: json.loads(blob) for source, blob in counts.items()}
+
+        # Only decode articles that are new or changed since the last read
+        changed = [article_id for article_id, digest in digests.items()
+                   if self._known.get(article_id, (None,))[0] != digest]
+        if changed:
+            for article_id, blob in zip(changed, self.client.hmget(ARTICLES, changed)):
+                if blob:
+                    self._known[article_id] = (digests[article_id], json.loads(blob))
+        self._known = {article_id: entry for article_id, entry in self._known.items() if article_id in digests}
+
+        articles = {article_id: entry[1] for article_id, entry in self._known.items()}
+        dated = [articles[article_id] for article_id in by_date if article_id in articles]
+
+        # Breaking news first, then newest first, like the refresh cycle orders the feed
+        feed = [a for a in dated if a.get('breaking_news')] + [a for a in dated if not a.get('breaking_news')]
+
+        # Trending follows the ranker's order; a store written without it breaks score ties by id, as the ranker does
+        scores = dict(trending)
+        order = meta.pop('trending_order', None) or sorted(scores, key=lambda article_id: (-scores[article_id], article_id))
+        ranked = [articles[article_id] for article_id in order if article_id in scores and article_id in articles]
+
+        views = {
+            'feed': feed,
+            'trending': [dict(article, trending_score=scores[article['id']]) for article in ranked]
+        }
+
+        pipe = self.client.pipeline(transaction=False)
+        for category in meta.get('categories', []):
+            pipe.zrevrange(CATEGORY.format(category), 0, category_limit - 1)
+        for category, ids in zip(meta.get('categories', []), pipe.execute()):
+            views[f'category:{category}'] = [articles[article_id] for article_id in ids if article_id in articles]
+
+        return {
+            'generation': int(generation or 0),
+            'views': views,
+            'extras': meta
+        }
@@ -0,0 +1,99 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# VADER analyzer of a pool worker process, loaded once by the pool initializer
+_analyzer = None
+
+
+def sentiment_label(compound):
+    """Bucket a VADER compound score the way the API reports sentiment"""
+    if compound >= 0.05:
+        return "positive"
+    elif compound <= -0.05:
+        return "negative"
+    return "neutral"
+
+
+def _load_analyzer():
+    global _analyzer
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    _analyzer = SentimentIntensityAnalyzer()
+
+
+def _score_batch(texts):
+    """Return the compound score of every text, 0.0 for texts VADER fails on"""
+    scores = []
+    for text in texts:
+        try:
+            scores.append(_analyzer.polarity_scores(text)['compound'])
+        except Exception:
+            scores.append(0.0)
+    return scores
+
+
+class SentimentPool:
+    """Scores batches of texts with VADER in worker processes
+
+    Scoring is CPU-bound, so running it in the fetching process holds the GIL
+    away from request handlers. Each worker loads the lexicon once when it
+    starts, and a batch is split into one chunk per worker. Workers are spawned
+    rather than forked, since the parent runs threads.
+    If the pool breaks, the batch is scored with `fallback` in-process and a
+    new pool is started for the next one.
+    """
+
+    def __init__(self, workers=2, fallback=None):
+        self.workers = workers
+        self.fallback = fallback
+        self._executor = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+        self.failures = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_load_analyzer)
+        return self._executor
+
+    def score(self, texts):
+        """Return the VADER compound score of each of `texts`, in order"""
+        if not texts:
+            return []
+
+        size = -(-len(texts) // self.workers)
+        chunks = [texts[start:start + size] for start in range(0, len(texts), size)]
+
+        with self._lock:
+            self.batches += 1
+            self.texts += len(texts)
+            try:
+                return [score for chunk in self._get_executor().map(_score_batch, chunks) for score in chunk]
+            except (BrokenProcessPool, OSError) as e:
+                logger.error(f"Sentiment pool failed, scoring {len(texts)} texts in-process: {str(e)}")
+                self.failures += 1
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+                if self.fallback is None:
+                    raise
+                return [self.fallback(text) for text in texts]
+
+    def stats(self):
+        """Return batch counters for monitoring"""
+        with self._lock:
+            return {'workers': self.workers, 'batches': self.batches, 'texts': self.texts, 'failures': self.failures}
+
+    def close(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
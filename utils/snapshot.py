@@ -0,0 +1,172 @@
+import os
+import json
+import mmap
+import struct
+from collections.abc import Sequence
+
+# File layout: header | JSON index | article JSON blobs and pre-rendered response bodies
+# The index maps each view to blob numbers, and blob numbers and response keys to (offset, length) in the body.
+MAGIC = b'ENSNAP01'
+HEADER = struct.Struct('<8sQQ')  # magic, generation, index length
+
+
+def write_snapshot(path, generation, views, extras, rendered=None, encoded=None):
+    """Serialize article views and extra state to `path` as one immutable snapshot
+
+    `views` maps a view name to a list of article mappings. Identical articles shared
+    between views are stored once. `rendered` maps response keys to pre-rendered
+    response bodies. `encoded` is an optional RecordCache of article JSON kept
+    between calls, so records already written with an earlier snapshot are not
+    serialized again. The file is written next to `path` and renamed into place, so
+    readers only ever map a complete snapshot.
+    """
+    body = bytearray()
+    offsets = []
+    blob_refs = {}
+    view_refs = {}
+
+    for name, articles in views.items():
+        refs = []
+        for article in articles:
+            blob = encoded.get(article) if encoded is not None else None
+            if blob is None:
+                blob = json.dumps(dict(article), separators=(',', ':')).encode('utf-8')
+                if encoded is not None:
+                    encoded.put(article, blob)
+            ref = blob_refs.get(blob)
+            if ref is None:
+                ref = len(offsets)
+                blob_refs[blob] = ref
+                offsets.append((len(body), len(blob)))
+                body += blob
+            refs.append(ref)
+        view_refs[name] = refs
+
+    rendered_refs = {}
+    for key, data in (rendered or {}).items():
+        rendered_refs[key] = (len(body), len(data))
+        body += data
+
+    index = json.dumps({
+        'views': view_refs,
+        'offsets': offsets,
+        'rendered': rendered_refs,
+        'extras': extras
+    }, separators=(',', ':')).encode('utf-8')
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, generation, len(index)))
+        f.write(index)
+        f.write(body)
+    os.replace(temp_path, path)
+
+
+class LocalSnapshot:
+    """Snapshot built in this process, with the read interface of MappedSnapshot
+
+    Nothing in it changes after it is built. A new generation is published by
+    replacing the one reference to the current snapshot, so readers get a
+    consistent generation without taking a lock or copying anything.
+    """
+
+    def __init__(self, generation=0, views=None, extras=None, rendered=None, indexes=None):
+        self.generation = generation
+        self._views = {name: tuple(articles) for name, articles in (views or {}).items()}
+        self._rendered = rendered or {}
+        self.extras = extras or {}
+        self.indexes = indexes or {}
+
+    def view_names(self):
+        return list(self._views)
+
+    def view(self, name):
+        """Return the articles of a view as a tuple"""
+        return self._views.get(name, ())
+
+    def rendered(self, key):
+        """Return the pre-rendered response body stored under `key`, or None"""
+        return self._rendered.get(key)
+
+    def rendered_keys(self):
+        return list(self._rendered)
+
+
+class MappedSnapshot:
+    """Read-only view of a snapshot file mapped into memory
+
+    Only the index is decoded up front; articles are decoded from the shared mapping
+    when a request touches them, so every worker reads the same pages.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.generation, index_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+
+        index = json.loads(self._map[HEADER.size:HEADER.size + index_length])
+        self._body_offset = HEADER.size + index_length
+        self._offsets = index['offsets']
+        self._views = index['views']
+        self._rendered = index['rendered']
+        self.extras = index['extras']
+
+    def is_current(self, path):
+        """Return True if `path` still refers to the file this snapshot was mapped from"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return True
+        return (stat.st_dev, stat.st_ino, stat.st_mtime_ns) == self._identity
+
+    def view_names(self):
+        return list(self._views)
+
+    def view(self, name):
+        """Return the articles of a view as a lazily decoded sequence"""
+        return MappedArticles(self, self._views.get(name, []))
+
+    def rendered(self, key):
+        """Return the pre-rendered response body stored under `key`, or None"""
+        location = self._rendered.get(key)
+        if location is None:
+            return None
+        start = self._body_offset + location[0]
+        return self._map[start:start + location[1]]
+
+    def article(self, ref):
+        """Decode a single article blob"""
+        start, length = self._offsets[ref]
+        start += self._body_offset
+        return json.loads(self._map[start:start + length])
+
+
+class MappedArticles(Sequence):
+    """Sequence of article dicts decoded on access from a MappedSnapshot"""
+
+    def __init__(self, snapshot, refs):
+        self._snapshot = snapshot
+        self._refs = refs
+
+    def __len__(self):
+        return len(self._refs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._snapshot.article(ref) for ref in self._refs[index]]
+        return self._snapshot.article(self._refs[index])
+
+
+def load_snapshot(path, current=None):
+    """Return the snapshot at `path`, reusing `current` if no newer one was published"""
+    if current is not None and current.is_current(path):
+        return current
+    try:
+        return MappedSnapshot(path)
+    except FileNotFoundError:
+        return current
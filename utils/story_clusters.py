@@ -0,0 +1,244 @@
+import itertools
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from utils.trending import article_timestamp
+
+WORD_PATTERN = re.compile(r"[A-Za-z][\w'&-]*")
+
+STOPWORDS = set("""
+a about after again against all also an and any are as at be been before being but by can could
+did do does down during each few for from further had has have having he her here hers him his how
+i if in into is it its just more most new no nor not now of off on once only or other our out over
+own same says she should so some such than that the their them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your first last week year years today watch video photos report news update live exclusive
+""".split())
+
+
+def extract_terms(text):
+    """Split text into named-entity-like terms and plain keywords
+
+    Without an NER model, capitalised words that are not stopwords stand in for
+    named entities ("Oppenheimer", "Nolan", "Netflix"). Other words of four or
+    more letters are keywords. Possessives and closing quotes are stripped, everything is lowercased.
+    """
+    entities, keywords = set(), set()
+    for word in WORD_PATTERN.findall(text):
+        term = word.lower().rstrip("'")
+        if term.endswith("'s"):
+            term = term[:-2]
+        if term in STOPWORDS or len(term) < 3:
+            continue
+        if word[0].isupper():
+            entities.add(term)
+        elif len(term) >= 4:
+            keywords.add(term)
+    return entities, keywords - entities
+
+
+class StoryCluster:
+    """Articles about one story and the outlets that covered it
+
+    Only the terms of the article that started the story and of its
+    `recent_members` latest articles are kept for matching, so a long-running
+    story doesn't accumulate enough terms to match anything.
+    """
+
+    __slots__ = ('id', 'article_ids', 'seed', 'recent', 'entities', 'coverage', 'headline', 'first_seen', 'last_seen')
+
+    def __init__(self, cluster_id, headline, published, recent_members=4):
+        self.id = cluster_id
+        self.article_ids = []
+        self.seed = None  # (entities, terms) of the first article
+        self.recent = deque(maxlen=recent_members)  # (entities, terms) of the latest articles after it
+        self.entities = Counter()  # entity -> members above that have it
+        self.coverage = {}  # article id -> (source, title, link, published epoch)
+        self.headline = headline
+        self.first_seen = published
+        self.last_seen = published
+
+    def members(self):
+        if self.seed is not None:
+            yield self.seed
+        yield from self.recent
+
+    def add_member(self, entities, keywords):
+        """Keep the terms of a new article for matching; return (entities gained, entities no longer kept)"""
+        before = set(self.entities)
+        member = (frozenset(entities), frozenset(entities | keywords))
+        if self.seed is None:
+            self.seed = member
+        else:
+            self.recent.append(member)
+        self.entities = Counter(term for member_entities, _ in self.members() for term in member_entities)
+        after = set(self.entities)
+        return after - before, before - after
+
+    def velocity(self, now, window):
+        """Distinct outlets that covered the story in the last `window` seconds"""
+        return len({source for source, _, _, published in self.coverage.values() if now - published <= window})
+
+
+class StoryClusterer:
+    """Incrementally groups related articles into stories and tracks how fast they spread
+
+    Each new article is compared with the first and the `recent_members` latest
+    articles of every live story that had an article within `window` seconds of
+    it. It joins the story of the most similar one, if the two share at least
+    `min_entities` entities and the Jaccard similarity of all their terms is at
+    least `min_similarity`. Otherwise it starts a new story. Candidate stories
+    are found through an inverted index of entity terms, so stories that share
+    nothing with the article are never scored. Capitalised words found in more
+    than `common_share` of the live stories (Title Case headline words like
+    "Announces") are demoted to keywords. Assignments persist between cycles;
+    stories expire `window` seconds after their newest article.
+    """
+
+    def __init__(self, window=86400, velocity_window=3600, min_entities=2, min_similarity=0.3, recent_members=4,
+                 common_share=0.05, id_prefix='story'):
+        self.window = window
+        self.velocity_window = velocity_window
+        self.min_entities = min_entities
+        self.min_similarity = min_similarity
+        self.recent_members = recent_members
+        self.common_share = common_share
+        self.id_prefix = id_prefix
+        self._clusters = {}
+        self._cluster_of = {}  # article id -> cluster id
+        self._covered = {}  # article id -> the record last recorded in its cluster's coverage
+        self._postings = {}  # entity term -> ids of clusters containing it
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _score(self, cluster, entities, terms):
+        """Similarity of the article to the closest of the cluster's kept members, 0 if too few entities are shared"""
+        best = 0.0
+        for member_entities, member_terms in cluster.members():
+            if len(entities & member_entities) < self.min_entities:
+                continue
+            best = max(best, len(terms & member_terms) / len(terms | member_terms))
+        return best
+
+    def _assign(self, article, published):
+        entities, keywords = extract_terms(f"{article.get('title', '')} {article.get('summary', '')}")
+        common = max(5, self.common_share * len(self._clusters))
+        generic = {term for term in entities if len(self._postings.get(term, ())) > common}
+        entities -= generic
+        keywords |= generic
+
+        best, best_score = None, 0.0
+        if len(entities) >= self.min_entities:
+            terms = entities | keywords
+            candidates = set().union(*(self._postings.get(term, ()) for term in entities))
+            for cluster_id in sorted(candidates):
+                cluster = self._clusters[cluster_id]
+                if abs(published - cluster.last_seen) > self.window:
+                    continue
+                score = self._score(cluster, entities, terms)
+                if score > best_score:
+                    best, best_score = cluster, score
+
+        if best is None or best_score < self.min_similarity:
+            best = StoryCluster(f"{self.id_prefix}-{next(self._ids)}", article.get('title', ''), published,
+                                recent_members=self.recent_members)
+            self._clusters[best.id] = best
+
+        best.article_ids.append(article['id'])
+        gained, dropped = best.add_member(entities, keywords)
+        best.first_seen = min(best.first_seen, published)
+        best.last_seen = max(best.last_seen, published)
+        for term in gained:
+            self._postings.setdefault(term, set()).add(best.id)
+        for term in dropped:
+            self._unpost(term, best.id)
+        self._cluster_of[article['id']] = best.id
+        return best
+
+    def _unpost(self, term, cluster_id):
+        postings = self._postings.get(term)
+        if postings is not None:
+            postings.discard(cluster_id)
+            if not postings:
+                del self._postings[term]
+
+    def _expire(self, now):
+        for cluster in [c for c in self._clusters.values() if now - c.last_seen > self.window]:
+            del self._clusters[cluster.id]
+            for article_id in cluster.article_ids:
+                self._cluster_of.pop(article_id, None)
+                self._covered.pop(article_id, None)
+            for term in cluster.entities:
+                self._unpost(term, cluster.id)
+
+    def update(self, articles, now=None):
+        """Cluster the articles not seen before and return {article id: story id} for `articles`
+
+        Articles published more than `window` seconds ago are left out.
+
+        Syndicated copies listed in an article's `also_reported_by` count as
+        coverage of its story by their own sources.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+
+            story_of = {}
+            for article in articles:
+                published = min(article_timestamp(article) or now, now)
+                # Too old to join a live story; clustering it would only start one that expires at once
+                if now - published > self.window:
+                    continue
+                cluster_id = self._cluster_of.get(article['id'])
+                # The same record as last cycle is already covered by its story
+                if cluster_id and self._covered.get(article['id']) is article:
+                    story_of[article['id']] = cluster_id
+                    continue
+                cluster = self._clusters[cluster_id] if cluster_id else self._assign(article, published)
+
+                cluster.coverage[article['id']] = (article.get('source'), article.get('title'), article.get('link'), published)
+                for copy in article.get('also_reported_by', []):
+                    cluster.coverage[copy['id']] = (copy.get('source'), copy.get('title'), copy.get('link'), published)
+                self._covered[article['id']] = article
+                story_of[article['id']] = cluster.id
+            return story_of
+
+    def velocities(self, now=None):
+        """Return {story id: velocity} for every live story"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return {cluster.id: cluster.velocity(now, self.velocity_window) for cluster in self._clusters.values()}
+
+    def stories(self, now=None, min_sources=1):
+        """Summaries of the live stories covered by at least `min_sources` outlets, fastest spreading first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            stories = []
+            for cluster in self._clusters.values():
+                sources = sorted({source for source, _, _, _ in cluster.coverage.values()})
+                if len(sources) < min_sources:
+                    continue
+                articles = sorted(cluster.coverage.items(), key=lambda item: (-item[1][3], item[0]))
+                stories.append({
+                    'id': cluster.id,
+                    'headline': cluster.headline,
+                    'velocity': cluster.velocity(now, self.velocity_window),
+                    'article_count': len(cluster.coverage),
+                    'sources': sources,
+                    'entities': [term for term, _ in cluster.entities.most_common(5)],
+                    'first_seen': format_epoch(cluster.first_seen),
+                    'last_seen': format_epoch(cluster.last_seen),
+                    'articles': [
+                        {'id': article_id, 'source': source, 'title': title, 'link': link,
+                         'published_date': format_epoch(published)}
+                        for article_id, (source, title, link, published) in articles
+                    ]
+                })
+            stories.sort(key=lambda story: (-story['velocity'], -story['article_count'], story['id']))
+            return stories
+
+
+def format_epoch(epoch):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(epoch))
@@ -1,25 +1,88 @@
-from datetime import datetime
+import calendar
+import heapq
 import logging
+import math
+import time
 
 logger = logging.getLogger(__name__)
 
-def update_trending_score(articles):
-    trending_articles = []
-    current_time = datetime.now()
 
-    for article in articles:
-        try:
-            pub_date = datetime.strptime(article['published_date'], '%Y-%m-%d %H:%M:%S')
-            hours_ago = (current_time - pub_date).total_seconds() / 3600
+def article_timestamp(article):
+    """Return an article's published time as a Unix timestamp, or None if it has none
 
-            time_score = max(1, 10 - int(hours_ago / 3))
-            source_bonus = 1.5 if "New York Times" in article['source'] or "BBC" in article['source'] else 1.0
-            breaking_bonus = 3.0 if article['breaking_news'] else 1.0
+    Articles carry it precomputed as `published_ts`; older stored articles only have
+    the 'YYYY-MM-DD HH:MM:SS' published_date, which feeds give in UTC.
+    """
+    timestamp = article.get('published_ts')
+    if timestamp is not None:
+        return timestamp
+    try:
+        return calendar.timegm(time.strptime(article['published_date'], '%Y-%m-%d %H:%M:%S'))
+    except (KeyError, TypeError, ValueError):
+        return None
 
-            article['trending_score'] = time_score * source_bonus * breaking_bonus
-            return article
 
-        except Exception as e:
-            logger.error(f"Error calculating trending score: {str(e)}")
-            article['trending_score'] = 0
-            return article
+class TrendingRanker:
+    """Ranks articles by a continuously decaying trending score
+
+    score = source weight * breaking multiplier * story bonus * 0.5 ** (age / half-life)
+
+    Every score decays at the same rate, so the order of two articles never
+    changes as time passes; it only changes when articles arrive or their weight
+    does. The ranking is therefore built once per refresh, by popping a heap
+    until `max_k` stories are found. A request for the top k within a time
+    window ranks that window's articles by themselves with a `limit` of k, since
+    recent articles can rank below older, heavier ones outside the kept `max_k`.
+    """
+
+    def __init__(self, half_life_hours=8, source_weights=None, breaking_multiplier=3.0,
+                 story_velocity_weight=0.5, max_k=100):
+        self.half_life = half_life_hours * 3600
+        self.source_weights = source_weights or {}
+        self.breaking_multiplier = breaking_multiplier
+        self.story_velocity_weight = story_velocity_weight
+        self.max_k = max_k
+
+    def source_weight(self, source):
+        return self.source_weights.get(source, 1.0)
+
+    def weight(self, article, story_velocity):
+        """Score of `article` at the moment it was published"""
+        weight = self.source_weight(article.get('source'))
+        if article.get('breaking_news'):
+            weight *= self.breaking_multiplier
+        # Stories picked up by several outlets at once are what is actually trending
+        velocity = story_velocity.get(article.get('story_id'), 1)
+        return weight * (1.0 + self.story_velocity_weight * max(0, velocity - 1))
+
+    def rank(self, articles, story_velocity=None, now=None, limit=None):
+        """Return the best `limit` (default `max_k`) article records with their trending_score set, best first
+
+        `story_velocity` maps story ids to the number of outlets that covered the story
+        in the last hour. Only the best article of each story is kept.
+        """
+        now = time.time() if now is None else now
+        limit = self.max_k if limit is None else limit
+        story_velocity = story_velocity or {}
+
+        heap = []
+        for article in articles:
+            timestamp = article_timestamp(article)
+            weight = self.weight(article, story_velocity)
+            # log2 of the score at time 0; the score at `now` is 2 ** (key - now / half_life)
+            key = math.log2(weight) + timestamp / self.half_life if timestamp is not None and weight > 0 else -math.inf
+            heap.append((-key, article['id'], article))
+        heapq.heapify(heap)
+
+        ranked = []
+        seen_stories = set()
+        while heap and len(ranked) < limit:
+            negative_key, _, article = heapq.heappop(heap)
+            story_id = article.get('story_id')
+            if story_id is not None:
+                if story_id in seen_stories:
+                    continue
+                seen_stories.add(story_id)
+            score = 2 ** (-negative_key - now / self.half_life) if negative_key != math.inf else 0
+            ranked.append(article.replace(trending_score=round(score, 4)))
+        return ranked